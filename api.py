@@ -0,0 +1,96 @@
+'''
+Library API of XML2YAML-OS: converts OJS XML in memory, for embedding the converter in Python services.
+
+    from api import ConversionOptions, convert
+    metadata = convert(xml_bytes, ConversionOptions(year="2024"))       # one records.Article per article
+    text = convert(xml_bytes, ConversionOptions(output_format="json"))  # the JSON of all articles
+
+The source is either the XML as bytes (stream-parsed like files, submission files are dropped while parsing) or an
+lxml element (tree) parsed by the caller. convert() neither exits nor touches the file system (no IS_CONTAINER
+paths, no output files, no cache, no extracted submission files), and neither importing this module nor convert()
+reads the XML2YAML_* environment variables, which only configure the CLI. An author registry is only used (and
+the converted authors added to it) if it is passed in the options. Fields added with fields.add_field() or
+fields.load_fields() are extracted as in the CLI, and spans are recorded if the program has turned on profiling
+(see profiling.py). Failures are raised as the exceptions of errors.py, which can be imported from here as well.
+'''
+
+import io
+from typing import TYPE_CHECKING, Iterator, List, NamedTuple, Optional, Sequence, Union
+
+from errors import ConversionError, InvalidOptionsError, InvalidPublicationError, InvalidXMLError, NoPublicationDataError  # noqa: F401
+
+if TYPE_CHECKING:
+    from lxml import etree
+    from records import Article
+    from registry import AuthorRegistry
+
+
+class ConversionOptions(NamedTuple):
+    '''Options of convert() (the CLI arguments of xml2yaml.py).'''
+    year: Optional[str] = None
+    volume: Optional[str] = None
+    # ORCIDs of authors as for --orcid: ["<AUTHOR_LASTNAME>=<ORCID>", ...]
+    orcid: Optional[Sequence[str]] = None
+    doi: Optional[str] = None
+    # None: the metadata records; "yaml", "json" or "ndjson": the documents of all articles as text
+    output_format: Optional[str] = None
+    # Author registry for back-filling ORCIDs and affiliations (the converted authors are added to it)
+    registry: Optional["AuthorRegistry"] = None
+
+
+def convert(source: Union[bytes, bytearray, memoryview, "etree._Element", "etree._ElementTree"], options: Optional[ConversionOptions] = None) -> Union[List["Article"], str]:
+    '''Function to convert an OJS XML export in memory.
+
+        Parameters
+        ----------
+        source: Union[bytes, etree._Element, etree._ElementTree]
+            The OJS XML as bytes, or the parsed export (or a single publication element).
+        options: Optional[ConversionOptions]
+            Year, volume, ORCIDs, DOI, output format and author registry (default: ConversionOptions()).
+
+        Returns
+        -------
+        Union[List[Article], str]
+            The metadata record of every article (see records.py; with the dict interface of the former
+            OrderedDicts, e.g. article["author-short"]), or with options.output_format the
+            YAML/JSON documents of all articles as written by the CLI.
+
+        Raises
+        ------
+        InvalidXMLError
+            If the bytes are not well-formed XML.
+        NoPublicationDataError
+            If the export contains no article with a publication.
+        InvalidPublicationError
+            If a publication lacks the authors node or author names.
+        InvalidOptionsError
+            If the output format is unknown.
+        TypeError
+            If source is neither bytes nor an lxml element.
+    '''
+    from lxml import etree
+    from xml2yaml import OUTPUT_FORMATS, create_metadata, dump_document
+    from xml_stream import iter_element_publications, iter_publications
+    if options is None:
+        options = ConversionOptions()
+    if options.output_format is not None and options.output_format not in OUTPUT_FORMATS:
+        raise InvalidOptionsError(f"Unknown output format {options.output_format!r} (expected one of {', '.join(OUTPUT_FORMATS)})")
+    publications: Iterator[etree._Element]
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        publications = iter_publications(io.BytesIO(source))
+    elif isinstance(source, (etree._Element, etree._ElementTree)):
+        publications = iter_element_publications(source)
+    else:
+        raise TypeError(f"source must be bytes or an lxml element, not {type(source).__name__}")
+    orcid = list(options.orcid) if options.orcid is not None else None
+    metadata: List[Article] = list()
+    try:
+        for publication in publications:
+            metadata.append(create_metadata(publication, options.year, options.volume, orcid, options.doi, options.registry))
+    except etree.XMLSyntaxError as e:
+        raise InvalidXMLError(str(e)) from e
+    if len(metadata) == 0:
+        raise NoPublicationDataError("NO_PUBLICATION_DATA_FOUND")
+    if options.output_format is None:
+        return metadata
+    return "".join(dump_document(data_dict, options.output_format) for data_dict in metadata)
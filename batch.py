@@ -0,0 +1,195 @@
+'''
+Batch conversion of many OJS XML files in one process (directory or glob pattern as input).
+
+Every input file is converted in a worker of a process pool and written to <OUTPUT_DIR>/<FILE_STEM>.yaml
+(or <OUTPUT_DIR>/<FILE_STEM>_<N>.yaml for exports with several articles; .json for JSON output). NDJSON output
+is collected from the workers into a single stream <OUTPUT_DIR>/metadata.ndjson (one line per article, in the
+order of the input files). With a name template (--name-template, see output.py) the files are named after the
+articles instead. All files are replaced atomically, so several batches can write into the same folder.
+Failing files do not stop the run; they are listed (together with the per-file timings) in a JSON summary.
+'''
+
+import glob
+import json
+import logging
+import os
+import time
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple, Union
+
+if TYPE_CHECKING:
+    from cache import ConversionCache
+    from xml2yaml import ProcessSettings
+
+SUMMARY_FILENAME: str = "batch_summary.json"
+NDJSON_FILENAME: str = "metadata.ndjson"
+
+
+def collect_xml_files(path: str) -> List[str]:
+    '''Function to collect the XML files to convert.
+
+        Parameters
+        ----------
+        path: str
+            A directory (all *.xml files directly in this directory are used) or a glob pattern.
+
+        Returns
+        -------
+        List[str]
+            The sorted list of file paths.
+    '''
+    if os.path.isdir(path):
+        pattern = os.path.join(path, "*.xml")
+    else:
+        pattern = path
+    return sorted(f for f in glob.glob(pattern) if os.path.isfile(f))
+
+def create_output_paths(xml_files: List[str], output_dir: str, extension: str = ".yaml") -> List[str]:
+    '''Function to map every input file on an output path <output_dir>/<FILE_STEM><extension>.
+
+        Files with the same stem (e.g. from different directories of a glob pattern) get a numeric suffix so
+        that no output is overwritten.
+    '''
+    output_paths: List[str] = list()
+    used: Dict[str, int] = dict()
+    for xml_file in xml_files:
+        stem = os.path.splitext(os.path.basename(xml_file))[0]
+        if stem in used:
+            used[stem] += 1
+            stem = f"{stem}_{used[stem]}"
+        else:
+            used[stem] = 1
+        output_paths.append(os.path.join(output_dir, stem + extension))
+    return output_paths
+
+def convert_one(task: Tuple[str, Optional[str], Optional[str], Optional[str], Optional[List[str]], Optional[str], Optional["ConversionCache"], str, Optional[str], bool]) -> Dict[str, Union[str, bool, float, List[str], None]]:
+    '''Worker function converting a single file. Never raises; errors are reported in the returned dict.
+
+        Parameters
+        ----------
+        task: Tuple
+            (xml_filepath, output_path, year, volume, orcid, doi, cache, output_format, name_template, lock); without
+            output_path (None) the documents are returned instead of saved.
+
+        Returns
+        -------
+        Dict
+            Result entry for the batch summary with the keys file, output (list of YAML files), ok, error, cached, seconds
+            (and documents if output_path is None).
+    '''
+    # Imported here so that the worker processes load the converter only once they actually convert
+    from xml2yaml import convert_documents, convert_file
+    xml_filepath, output_path, year, volume, orcid, doi, cache, output_format, name_template, lock = task
+    start = time.perf_counter()
+    result: Dict[str, Union[str, bool, float, List[str], None]] = {"file": xml_filepath, "output": list(), "ok": True, "error": None, "cached": False}
+    hits = cache.hits if cache is not None else 0
+    try:
+        if output_path is None:
+            documents = [document for document, _ in convert_documents(xml_filepath, year, volume, orcid, doi, cache, output_format)]
+            result["documents"] = documents
+            converted = len(documents)
+        else:
+            output_paths = convert_file(xml_filepath, output_path, year, volume, orcid, doi, cache, output_format, name_template, lock)
+            result["output"] = output_paths
+            converted = len(output_paths)
+        result["cached"] = cache is not None and cache.hits > hits
+        if converted == 0:
+            raise ValueError("NO_PUBLICATION_DATA_FOUND")
+    except Exception as e:
+        result["ok"] = False
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = round(time.perf_counter() - start, 6)
+    return result
+
+def collect_results(results: Iterable[Dict], output_dir: str, output_format: str, lock: bool = False) -> List[Dict]:
+    '''Function to collect the results of convert_one() (in input order); NDJSON documents are written as they arrive.'''
+    if output_format != "ndjson":
+        return list(results)
+    from output import atomic_open
+    ndjson_path = os.path.join(output_dir, NDJSON_FILENAME)
+    collected: List[Dict] = list()
+    with atomic_open(ndjson_path, lock) as f:
+        for result in results:
+            documents = result.pop("documents", None)
+            if documents:
+                f.writelines(documents)
+                result["output"] = [ndjson_path]
+            collected.append(result)
+    return collected
+
+def run_batch(path: str, year: Optional[str], volume: Optional[str], orcid: Optional[List[str]], doi: Optional[str], output_dir: str = "yaml_output", jobs: Optional[int] = None, cache: Optional["ConversionCache"] = None, output_format: str = "yaml", name_template: Optional[str] = None, lock: bool = False, settings: Optional["ProcessSettings"] = None) -> Dict:
+    '''Function to convert all XML files in a directory or matching a glob pattern.
+
+        Parameters
+        ----------
+        path: str
+            Directory or glob pattern of the OJS XML files.
+        year, volume, orcid, doi
+            CLI values applied to every file (see xml2yaml.main()).
+        output_dir: str (default: "yaml_output")
+            Folder for the YAML files and the summary file batch_summary.json.
+        jobs: Optional[int]
+            Number of worker processes (default: number of CPU cores).
+        cache: Optional[ConversionCache]
+            Conversion cache for unchanged files (hit/miss counts are added to its stats after the run).
+        output_format: str (default: "yaml")
+            "yaml", "json" (one file per input file) or "ndjson" (all articles in <output_dir>/metadata.ndjson).
+        name_template: Optional[str]
+            Name the YAML/JSON file of every article after this template (see output.py).
+        lock: bool (default: False)
+            Hold an exclusive flock on <FILE>.lock while writing each output file.
+        settings: Optional[ProcessSettings]
+            Fields, profiling, registry and file extraction of the worker processes (see xml2yaml.ProcessSettings;
+            the settings of the calling process are applied by the caller).
+
+        Returns
+        -------
+        Dict
+            The batch summary (also saved as <output_dir>/batch_summary.json).
+    '''
+    xml_files = collect_xml_files(path)
+    if len(xml_files) == 0:
+        logging.warning(f"No XML files found for {path}.")
+    from output import write_atomic
+    from xml2yaml import OUTPUT_EXTENSIONS, ProcessSettings, configure_process
+    if output_format == "ndjson":
+        # The workers return the JSON lines, which are written to a single stream here
+        output_paths: List[Optional[str]] = [None] * len(xml_files)
+    else:
+        output_paths = list(create_output_paths(xml_files, output_dir, OUTPUT_EXTENSIONS[output_format]))
+    tasks = [(xml_file, output_path, year, volume, orcid, doi, cache, output_format, name_template, lock) for xml_file, output_path in zip(xml_files, output_paths)]
+    workers = max(1, min(jobs or os.cpu_count() or 1, len(tasks)))
+    start = time.perf_counter()
+    if workers == 1:
+        results = collect_results(map(convert_one, tasks), output_dir, output_format, lock)
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        # Larger chunks reduce the IPC overhead for big back catalogues
+        chunksize = max(1, len(tasks) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers, initializer=configure_process, initargs=(settings or ProcessSettings(),)) as executor:
+            results = collect_results(executor.map(convert_one, tasks, chunksize=chunksize), output_dir, output_format, lock)
+    failed = [result for result in results if not result["ok"]]
+    cached = sum(1 for result in results if result["cached"])
+    if cache is not None:
+        cache.update_stats(hits=cached, misses=len(results) - cached)
+        cache.evict()
+    summary = {
+        "total": len(results),
+        "converted": len(results) - len(failed),
+        "failed": len(failed),
+        "cached": cached,
+        "jobs": workers,
+        "seconds": round(time.perf_counter() - start, 6),
+        "files": results,
+    }
+    write_atomic(os.path.join(output_dir, SUMMARY_FILENAME), json.dumps(summary, indent=2), lock)
+    for result in failed:
+        logging.error(f"Conversion of {result['file']} failed: {result['error']}")
+    if name_template is not None:
+        # Names from the template are only unique within an export; a file written twice keeps the last article
+        written: Dict[str, str] = dict()
+        for result in results:
+            for output_path in result["output"]:
+                if output_path in written and written[output_path] != result["file"]:
+                    logging.warning(f"{output_path} has been written for {written[output_path]} and {result['file']}; please check the name template.")
+                written[output_path] = result["file"]
+    return summary
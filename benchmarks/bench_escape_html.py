@@ -0,0 +1,93 @@
+'''
+Micro-benchmark of functions.escape_html against the former BeautifulSoup implementation.
+
+Before timing, the output of both implementations is compared on the sample texts and on randomly generated
+HTML snippets. The reference implementation needs beautifulsoup4 (pip install -r benchmarks/requirements.txt);
+without it, the parity check and the comparison are skipped and only escape_html is timed.
+
+Usage: python benchmarks/bench_escape_html.py [--number N] [--fuzz N]
+'''
+
+import argparse
+import html
+import os
+import random
+import re
+import sys
+import timeit
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from functions import escape_html
+
+try:
+    from bs4 import BeautifulSoup
+    HAVE_BS4 = True
+except ImportError:
+    HAVE_BS4 = False
+
+SAMPLES = {
+    "title_plain": "The Eternal Boy: A Study in Agelessness and Memory",
+    "title_em": "The Eternal Boy: A Study in &lt;em&gt;Agelessness&lt;/em&gt; and Memory",
+    "abstract": "&lt;p&gt;How does the notion of &lt;i&gt;agelessness&lt;/i&gt; shape identity and memory in an eternal youth like Peter Pan?\n\tThis article   examines the &lt;b&gt;metaphysics&lt;/b&gt; of agelessness through the lens of Peter Pan’s unchanging form and his shifting memories.&lt;/p&gt;\n&lt;p&gt;We argue that Neverland serves as a temporal vacuum &amp; explore the implications.&lt;/p&gt;" * 3,
+    "abstract_attrs": "&lt;p class=\"abstract\"&gt;Flight &amp; &lt;span style=\"x\"&gt;fantasy&lt;/span&gt; ontology &amp;hellip &amp;#150; &lt;br/&gt;&lt;!-- note --&gt;&lt;/p&gt;" * 5,
+}
+
+
+def escape_html_reference(input: str) -> str:
+    '''The former implementation of functions.escape_html.'''
+    input = html.unescape(input)
+    input = re.sub(r"\n|\t", "", input)
+    input = re.sub(r"\s{2,}", " ", input)
+    input = re.sub(r"<em>|</em>", r"*", input)
+    input = re.sub(r"<i>|</i>", r"*", input)
+    input = re.sub(r"<b>|</b>", r"**", input)
+    soup = BeautifulSoup(input, "html.parser")
+    input = soup.get_text()
+    return input
+
+def random_snippet(rng: random.Random) -> str:
+    '''Creates a random snippet of (often malformed) HTML.'''
+    pieces = ["<p>", "</p>", "<em>", "</em>", "<i>", "</i>", "<b>", "</b>", "<br>", "<br/>", "</br>", "<script>", "</script>",
+              "<style>", "</style>", "<rt>", "</rt>", "<pre>", "</pre>", "<template>", "</template>", "<!-- c -->", "<![CDATA[x]]>",
+              "<![CDATA[]]>", "<!DOCTYPE html>", "<?pi x?>", "<span class=\"a\">", "</span>", "<a href='x>y'>", "</a >", "< p>", "<3",
+              "&amp;", "&amp;amp;", "&lt;b&gt;", "&foo;", "&hellip", "&#150;", "&#x2014;", "&#99999999;", "&", " & ", "\n", "\t",
+              "  ", " ", "\r", "\x0c", "\xa0", "text", "Wörter", "a<b", "x > y", "</", "<", "&#", "<P>", "<EM>", "*"]
+    return "".join(rng.choice(pieces) for _ in range(rng.randint(0, 12)))
+
+def check_parity(fuzz: int) -> List[str]:
+    '''Returns the inputs for which both implementations differ.'''
+    rng = random.Random(42)
+    inputs = list(SAMPLES.values()) + [random_snippet(rng) for _ in range(fuzz)]
+    return [text for text in inputs if escape_html(text) != escape_html_reference(text)]
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Micro-benchmark of escape_html.")
+    parser.add_argument("--number", type=int, default=2000, help="Number of calls per sample")
+    parser.add_argument("--fuzz", type=int, default=20000, help="Number of random snippets for the parity check")
+    args = parser.parse_args()
+
+    if not HAVE_BS4:
+        print("beautifulsoup4 is not installed (pip install -r benchmarks/requirements.txt): skipping the parity check and the reference timings.")
+        print(f"{'sample':<16}{'escape_html (us)':>18}")
+        for name, text in SAMPLES.items():
+            current = timeit.timeit(lambda: escape_html(text), number=args.number) / args.number * 1e6
+            print(f"{name:<16}{current:>18.1f}")
+        return
+
+    mismatches = check_parity(args.fuzz)
+    if mismatches:
+        for text in mismatches[:10]:
+            print(f"MISMATCH {text!r}: {escape_html(text)!r} != {escape_html_reference(text)!r}")
+        sys.exit(1)
+    print(f"Parity check passed ({len(SAMPLES) + args.fuzz} inputs).")
+
+    print(f"{'sample':<16}{'reference (us)':>16}{'escape_html (us)':>18}{'speed-up':>10}")
+    for name, text in SAMPLES.items():
+        reference = timeit.timeit(lambda: escape_html_reference(text), number=args.number) / args.number * 1e6
+        current = timeit.timeit(lambda: escape_html(text), number=args.number) / args.number * 1e6
+        print(f"{name:<16}{reference:>16.1f}{current:>18.1f}{reference / current:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
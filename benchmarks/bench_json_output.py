@@ -0,0 +1,81 @@
+'''
+Parity check and micro-benchmark of the JSON output (--format json/ndjson) against the YAML output.
+
+Before timing, the JSON of xml2yaml.dump_json() is parsed back on sample metadata and on the random metadata of
+benchmarks/bench_yaml_dump.py and compared with the values of the metadata record (markdown emphasis, *volume*, nulls,
+lists; PlainInt as number), i.e. with what pandoc reads from the YAML. The exit code is 1 if any document differs.
+Documents whose YAML does not give back these values either (YAML folds NEL/CR/line separators in quoted scalars,
+plain-style strings like true change their type) are counted separately. The timing covers emitting plus
+re-parsing a document (what a batch pays per article before pandoc sees the metadata).
+
+Usage: python benchmarks/bench_json_output.py [--number N] [--fuzz N]
+'''
+
+import argparse
+import json
+import os
+import random
+import sys
+import timeit
+from typing import List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_yaml_dump import random_metadata, sample_metadata
+from records import Article, Record
+from xml2yaml import dump_json, dump_yaml
+from yaml_setup import PlainInt, yaml
+
+# libyaml's parser if available (the fastest way to re-parse the YAML in Python)
+Loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def plain_values(value):
+    '''Returns the values of a metadata record as plain dicts, lists, strings and numbers.'''
+    if isinstance(value, PlainInt):
+        return int(value)
+    if isinstance(value, str):
+        return str(value)
+    if isinstance(value, (dict, Record)):
+        return {key: plain_values(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [plain_values(item) for item in value]
+    return value
+
+def check_parity(fuzz: int) -> Tuple[List[Article], int]:
+    '''Returns the metadata records whose JSON documents parse to different values and the number of YAML documents that do.'''
+    rng = random.Random(42)
+    inputs = [sample_metadata()] + [random_metadata(rng) for _ in range(fuzz)]
+    mismatches: List[Article] = list()
+    yaml_lossy = 0
+    for data_dict in inputs:
+        expected = plain_values(data_dict)
+        if json.loads(dump_json(data_dict)) != expected or json.loads(dump_json(data_dict, compact=True)) != expected:
+            mismatches.append(data_dict)
+        if yaml.load(dump_yaml(data_dict), Loader=Loader) != expected:
+            yaml_lossy += 1
+    return mismatches, yaml_lossy
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Parity check and micro-benchmark of the JSON output.")
+    parser.add_argument("--number", type=int, default=2000, help="Number of calls per timing")
+    parser.add_argument("--fuzz", type=int, default=20000, help="Number of random metadata records for the parity check")
+    args = parser.parse_args()
+    mismatches, yaml_lossy = check_parity(args.fuzz)
+    if mismatches:
+        print(f"PARITY FAILED for {len(mismatches)} inputs, e.g.:\n{dump_yaml(mismatches[0])}\n{dump_json(mismatches[0])}")
+        sys.exit(1)
+    print(f"Parity OK ({args.fuzz + 1} documents; the YAML of {yaml_lossy} of them does not give back the exact values).")
+    data_dict = sample_metadata()
+    timings = {
+        "yaml": lambda: yaml.load(dump_yaml(data_dict), Loader=Loader),
+        "json": lambda: json.loads(dump_json(data_dict)),
+        "ndjson": lambda: json.loads(dump_json(data_dict, compact=True)),
+    }
+    print(f"{'format':<8} {'emit + parse µs/call':>22}")
+    for name, function in timings.items():
+        print(f"{name:<8} {timeit.timeit(function, number=args.number) / args.number * 1e6:>22.1f}")
+
+if __name__ == "__main__":
+    main()
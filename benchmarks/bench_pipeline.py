@@ -0,0 +1,204 @@
+'''
+Benchmark suite of the conversion pipeline on synthetic OJS exports (see benchmarks/ojs_corpus.py).
+
+1. Pipeline: every scenario (author count, abstract length/HTML density, keyword count, submission_file payloads,
+   multi-article exports) is converted with xml2yaml.convert_file() in a fresh subprocess; the wall time and the
+   peak RSS of that process are recorded.
+2. Hot spots: escape_html, parse_given_name, create_keywords_4yaml, the author loop (add_authors), the YAML
+   emission (dump_yaml) and the in-memory conversion of the library API (api.convert) are timed in-process; their peak Python memory is measured with tracemalloc.
+
+The results (plus the versions of Python, lxml and PyYAML) are saved as JSON, so runs before and after an upgrade
+can be compared with --compare.
+
+Usage: python benchmarks/bench_pipeline.py [--output FILE] [--compare OLD_FILE] [--repeat N] [--quick]
+'''
+
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+from typing import Callable, Dict, List, Optional, TypeVar
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from ojs_corpus import CorpusParams, generate_export
+
+SCENARIOS: Dict[str, CorpusParams] = {
+    "baseline": CorpusParams(),
+    "many_authors": CorpusParams(authors=60),
+    "long_abstract": CorpusParams(abstract_words=3000),
+    "html_heavy": CorpusParams(abstract_words=600, html_density=0.8),
+    "many_keywords": CorpusParams(keywords=200),
+    "large_payload": CorpusParams(files=3, file_size_kb=32 * 1024),
+    "issue": CorpusParams(articles=25, file_size_kb=256),
+}
+# Smaller payloads and issues for --quick runs
+QUICK_SCENARIOS: Dict[str, CorpusParams] = dict(SCENARIOS, large_payload=CorpusParams(files=2, file_size_kb=4 * 1024), issue=CorpusParams(articles=5))
+
+
+def versions() -> Dict[str, Optional[str]]:
+    '''Returns the versions the results depend on.'''
+    import yaml
+    from lxml import etree
+    try:
+        commit: Optional[str] = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=BASE_DIR).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "lxml": ".".join(str(part) for part in etree.LXML_VERSION),
+        "libxml2": ".".join(str(part) for part in etree.LIBXML_VERSION),
+        "pyyaml": yaml.__version__,
+        "libyaml": str(yaml.__with_libyaml__),
+        "platform": platform.platform(),
+        "commit": commit,
+    }
+
+def run_pipeline(xml_filepath: str, repeat: int) -> Dict[str, float]:
+    '''Converts xml_filepath repeat times in this process (called in the subprocess, see measure_pipeline()).'''
+    from xml2yaml import convert_file
+    times: List[float] = list()
+    with tempfile.TemporaryDirectory() as output_dir:
+        # Warm-up run: the converter modules are imported on the first conversion
+        convert_file(xml_filepath, os.path.join(output_dir, "metadata.yaml"), "2024", None, None, None)
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        for _ in range(repeat):
+            start = time.perf_counter()
+            convert_file(xml_filepath, os.path.join(output_dir, "metadata.yaml"), "2024", None, None, None)
+            times.append(time.perf_counter() - start)
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "seconds_median": statistics.median(times),
+        "seconds_min": min(times),
+        # ru_maxrss is in KB on Linux
+        "max_rss_mb": rss_after / 1024,
+        "rss_growth_mb": (rss_after - rss_before) / 1024,
+    }
+
+def measure_pipeline(scenarios: Dict[str, CorpusParams], repeat: int) -> Dict[str, Dict]:
+    '''Generates an export per scenario and converts it in a fresh subprocess (so the peak RSS is per scenario).'''
+    results: Dict[str, Dict] = dict()
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        for name, params in scenarios.items():
+            xml_filepath = os.path.join(corpus_dir, name + ".xml")
+            size = generate_export(xml_filepath, params)
+            process = subprocess.run([sys.executable, os.path.abspath(__file__), "--run-pipeline", xml_filepath, "--repeat", str(repeat)], capture_output=True, text=True, cwd=BASE_DIR)
+            if process.returncode != 0:
+                raise RuntimeError(f"Pipeline run of scenario {name} failed:\n{process.stderr}")
+            results[name] = dict(params._asdict(), size_mb=size / 1024 / 1024, **json.loads(process.stdout))
+            os.unlink(xml_filepath)
+            print(f"pipeline {name:<16} {results[name]['size_mb']:>9.2f} MB {results[name]['seconds_median'] * 1000:>10.2f} ms {results[name]['max_rss_mb']:>9.1f} MB RSS")
+    return results
+
+def measure_hotspot(function: Callable[[], object], repeat: int) -> Dict[str, float]:
+    '''Times function (µs per call, median of repeat runs) and measures the peak Python memory of one call.'''
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    us_per_call = statistics.median(timer.repeat(repeat=repeat, number=number)) / number * 1e6
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"us_per_call": us_per_call, "peak_kb": peak / 1024}
+
+T = TypeVar("T")
+
+def required(value: Optional[T], what: str) -> T:
+    '''Returns value, failing the benchmark when the synthetic export lacks it.'''
+    if value is None:
+        raise RuntimeError(f"The synthetic export has no {what}")
+    return value
+
+def measure_hotspots(repeat: int) -> Dict[str, Dict]:
+    '''Times the hot spots of create_metadata() on publications of the synthetic scenarios.'''
+    import api
+    import xml2yaml
+    from functions import create_keywords_4yaml, escape_html, parse_given_name
+    from records import Article
+    from xml_stream import parse_publication
+    publications = dict()
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        for name in ("baseline", "many_authors", "long_abstract", "html_heavy", "many_keywords"):
+            xml_filepath = os.path.join(corpus_dir, name + ".xml")
+            generate_export(xml_filepath, SCENARIOS[name])
+            publications[name] = required(parse_publication(xml_filepath), f"publication ({name})")
+        with open(os.path.join(corpus_dir, "baseline.xml"), "rb") as f:
+            baseline_xml = f.read()
+    ns = "{http://pkp.sfu.ca}"
+
+    def author_loop(publication):
+        authors_node = publication.find(f".//{ns}authors")
+        return lambda: xml2yaml.add_authors(Article(), authors_node, None)
+
+    metadata = {name: xml2yaml.create_metadata(publication, "2024", None, None, None) for name, publication in publications.items()}
+    title = required(publications["baseline"].findtext(f"{ns}title"), "title")
+    abstracts = {name: required(publication.findtext(f"{ns}abstract"), f"abstract ({name})") for name, publication in publications.items()}
+    keywords_node = required(publications["many_keywords"].find(f".//{ns}keywords"), "keywords")
+    authors_node = required(publications["many_authors"].find(f".//{ns}authors"), "authors")
+    given_names = [required(author.findtext(f".//{ns}givenname"), "given name") for author in authors_node]
+    hotspots: Dict[str, Callable[[], object]] = {
+        "escape_html.title": lambda: escape_html(title),
+        "escape_html.abstract": lambda: escape_html(abstracts["baseline"]),
+        "escape_html.long_abstract": lambda: escape_html(abstracts["long_abstract"]),
+        "escape_html.html_heavy": lambda: escape_html(abstracts["html_heavy"]),
+        "parse_given_name": lambda: [parse_given_name(given_name, abbr_style="full") for given_name in given_names],
+        "create_keywords_4yaml.many_keywords": lambda: create_keywords_4yaml(keywords_node),
+        "author_loop.baseline": author_loop(publications["baseline"]),
+        "author_loop.many_authors": author_loop(publications["many_authors"]),
+        "create_metadata.baseline": lambda: xml2yaml.create_metadata(publications["baseline"], "2024", None, None, None),
+        "yaml_dump.baseline": lambda: xml2yaml.dump_yaml(metadata["baseline"]),
+        "yaml_dump.many_authors": lambda: xml2yaml.dump_yaml(metadata["many_authors"]),
+        "api.convert.baseline": lambda: api.convert(baseline_xml, api.ConversionOptions(year="2024", output_format="yaml")),
+    }
+    results: Dict[str, Dict] = dict()
+    for name, function in hotspots.items():
+        results[name] = measure_hotspot(function, repeat)
+        print(f"hotspot  {name:<36} {results[name]['us_per_call']:>10.1f} µs {results[name]['peak_kb']:>9.1f} KB")
+    return results
+
+def compare(old: Dict, new: Dict) -> None:
+    '''Prints the changes of the timings and peak memory between two result files.'''
+    print(f"\nComparison with {old['versions']} (ratio new/old, > 1.00 = slower/larger)")
+    for section, time_key, memory_key in (("pipeline", "seconds_median", "max_rss_mb"), ("hotspots", "us_per_call", "peak_kb")):
+        for name, result in new[section].items():
+            if name not in old[section]:
+                continue
+            before = old[section][name]
+            print(f"{section:<9} {name:<36} time {result[time_key] / before[time_key]:>6.2f}  memory {result[memory_key] / max(before[memory_key], 1e-9):>6.2f}")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark suite of the XML2YAML pipeline on synthetic OJS exports.")
+    parser.add_argument("--output", type=str, default="bench_pipeline.json", help="JSON file for the results (default: bench_pipeline.json)")
+    parser.add_argument("--compare", type=str, help="JSON results of an earlier run to compare with")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of repetitions per measurement (default: 5)")
+    parser.add_argument("--quick", action="store_true", help="Smaller payloads and issues")
+    parser.add_argument("--run-pipeline", type=str, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.run_pipeline is not None:
+        print(json.dumps(run_pipeline(args.run_pipeline, args.repeat)))
+        return
+    results = {
+        "versions": versions(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "pipeline": measure_pipeline(QUICK_SCENARIOS if args.quick else SCENARIOS, args.repeat),
+        "hotspots": measure_hotspots(args.repeat),
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to {args.output}")
+    if args.compare is not None:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(json.load(f), results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+'''
+Start-up benchmark of the xml2yaml.py CLI with a checked-in budget (benchmarks/startup_budget.json).
+
+For every scenario (e.g. --help or a missing input file), the script measures
+- the median wall time of the CLI minus the median wall time of a bare interpreter ("overhead"),
+- the cumulative import time of all modules the CLI imports on top of a bare interpreter (python -X importtime),
+and checks that none of the forbidden (heavy) modules is imported. The exit code is 1 if a budget is exceeded.
+
+Usage: python benchmarks/bench_startup.py [--budget FILE] [--json FILE]
+'''
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Tuple
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLI = os.path.join(BASE_DIR, "xml2yaml.py")
+
+
+def wall_time(cmd: List[str], repeat: int) -> float:
+    '''Returns the median wall time of cmd in ms.'''
+    times: List[float] = list()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, cwd=BASE_DIR)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+def import_times(cmd: List[str]) -> Dict[str, Tuple[int, int]]:
+    '''Returns {module: (self_us, cumulative_us)} of all modules imported by cmd (python -X importtime).'''
+    result = subprocess.run([cmd[0], "-X", "importtime"] + cmd[1:], capture_output=True, text=True, cwd=BASE_DIR)
+    modules: Dict[str, Tuple[int, int]] = dict()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if self_us.strip().isdigit():
+            modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Start-up benchmark of the xml2yaml.py CLI.")
+    parser.add_argument("--budget", type=str, default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "startup_budget.json"), help="Budget file")
+    parser.add_argument("--json", type=str, help="Save the results as JSON to this file")
+    args = parser.parse_args()
+    with open(args.budget, "r", encoding="utf-8") as f:
+        budget = json.load(f)
+
+    baseline_cmd = [sys.executable, "-c", "pass"]
+    baseline_ms = wall_time(baseline_cmd, budget["repeat"])
+    baseline_modules = set(import_times(baseline_cmd))
+    results: Dict[str, Any] = {"python": sys.version.split()[0], "baseline_ms": round(baseline_ms, 2), "scenarios": dict()}
+    violations: List[str] = list()
+    for name, scenario in budget["scenarios"].items():
+        cmd = [sys.executable, CLI] + scenario["args"]
+        overhead_ms = wall_time(cmd, budget["repeat"]) - baseline_ms
+        modules = {module: times for module, times in import_times(cmd).items() if module not in baseline_modules}
+        import_ms = sum(self_us for self_us, _ in modules.values()) / 1000
+        forbidden = sorted(module for module in modules if module.split(".")[0] in budget["forbidden_modules"] or module in budget["forbidden_modules"])
+        slowest = sorted(modules.items(), key=lambda item: item[1][1], reverse=True)[:5]
+        results["scenarios"][name] = {"overhead_ms": round(overhead_ms, 2), "import_ms": round(import_ms, 2), "modules": len(modules), "forbidden_modules": forbidden}
+        print(f"{name}: overhead {overhead_ms:.1f} ms (budget {scenario['max_overhead_ms']} ms), imports {import_ms:.1f} ms in {len(modules)} modules (budget {scenario['max_import_ms']} ms)")
+        print("    slowest imports: " + ", ".join(f"{module} {cumulative / 1000:.1f} ms" for module, (_, cumulative) in slowest))
+        if overhead_ms > scenario["max_overhead_ms"]:
+            violations.append(f"{name}: overhead {overhead_ms:.1f} ms > {scenario['max_overhead_ms']} ms")
+        if import_ms > scenario["max_import_ms"]:
+            violations.append(f"{name}: imports {import_ms:.1f} ms > {scenario['max_import_ms']} ms")
+        if forbidden:
+            violations.append(f"{name}: imports forbidden modules {', '.join(forbidden)}")
+    if args.json is not None:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if violations:
+        print("BUDGET EXCEEDED\n" + "\n".join(violations))
+        sys.exit(1)
+    print("Start-up budget met.")
+
+if __name__ == "__main__":
+    main()
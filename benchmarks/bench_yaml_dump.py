@@ -0,0 +1,106 @@
+'''
+Parity check and micro-benchmark of the YAML emission with libyaml's CDumper against the pure-Python Dumper.
+
+Before timing, xml2yaml.dump_yaml() (CDumper if available) is compared byte by byte with the pure-Python Dumper
+on the metadata records of sample metadata and of randomly generated metadata (literal block abstracts, single-quoted
+titles/DOIs, plain strings, lists, empty values, unicode, long lines, YAML indicators, whitespace). The exit code
+is 1 if any document differs.
+
+Usage: python benchmarks/bench_yaml_dump.py [--number N] [--fuzz N]
+'''
+
+import argparse
+import os
+import random
+import sys
+import timeit
+from typing import List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from records import Affiliation, Article, Author
+from xml2yaml import dump_yaml
+from yaml_setup import Dumper, LiteralString, PlainInt, PlainList, PlainString, SingleQuotedString, select_dumper, yaml
+
+PIECES = ["Peter", "Pan", "Neverland", "Wörter", "Ægir", "Ελληνικά", "日本語", "😀", " ", "  ", ": ", ":", "?", "-", "- ",
+          "#", " #", "'", "''", "\"", "\\", "*", "**", "&", "!", "|", ">", "%", "@", "`", ",", "[", "]", "{", "}",
+          "\t", "\n", "\n\n", "\r", "\x85", " ", "﻿", "\xa0", "\x07", "null", "true", "~", "1", "0.5",
+          "2024", "0000-0002-5678-9012", "10.33735/phimisci.2024.123", "...", "---", "long " * 30]
+# Pieces of typical metadata (documents made of these are emitted by libyaml)
+CLEAN_PIECES = [piece for piece in PIECES if select_dumper(piece) is not yaml.Dumper and piece.strip() != ""] + [" ", "  "]
+
+
+def random_text(rng: random.Random, max_pieces: int = 12) -> str:
+    '''Creates random text, mostly made of typical metadata pieces.'''
+    if rng.random() < 0.9:
+        return "".join(rng.choice(CLEAN_PIECES) for _ in range(rng.randint(0, max_pieces))).strip(" ")
+    return "".join(rng.choice(PIECES) for _ in range(rng.randint(0, max_pieces)))
+
+def random_metadata(rng: random.Random) -> Article:
+    '''Creates a metadata record with the shape of create_metadata() output and random values.'''
+    data_dict = Article()
+    data_dict["title"] = SingleQuotedString(random_text(rng))
+    data_dict["subtitle"] = rng.choice(["", SingleQuotedString(random_text(rng))])
+    for _ in range(rng.randint(0, 5)):
+        author_dict = Author()
+        author_dict["name"] = random_text(rng, 4)
+        author_dict["affiliation"] = [Affiliation(random_text(rng, 6)) for _ in range(rng.randint(0, 3))]
+        author_dict["email"] = random_text(rng, 3)
+        author_dict["orcid"] = rng.choice([None, random_text(rng, 2)])
+        data_dict["author"].append(author_dict)
+    data_dict["keywords"] = sorted(random_text(rng, 3) for _ in range(rng.randint(0, 6)))
+    data_dict["abstract"] = LiteralString(random_text(rng, 60))
+    data_dict["author-short"] = rng.choice([None, SingleQuotedString(random_text(rng, 6))])
+    data_dict["date"] = rng.choice([None, SingleQuotedString("2024")])
+    data_dict["volume"] = rng.choice(["*7*", "NO_VOL_NUMBER_FOUND", random_text(rng, 2)])
+    data_dict["doi"] = rng.choice(["NO_DOI_FOUND", SingleQuotedString(random_text(rng, 3))])
+    data_dict["extra"] = rng.choice([PlainString(random_text(rng, 3)), PlainInt(str(rng.randint(0, 99))), PlainList([random_text(rng, 2) for _ in range(3)])])
+    return data_dict
+
+def sample_metadata() -> Article:
+    data_dict = Article()
+    data_dict["title"] = SingleQuotedString("The Eternal Boy")
+    data_dict["subtitle"] = SingleQuotedString("A Study in *Agelessness* and Memory")
+    author_dict = Author()
+    author_dict["name"] = "Wendy Moira Angela Darling"
+    author_dict["affiliation"] = [Affiliation("University of Oxford"), Affiliation("Kensington Gardens")]
+    author_dict["email"] = "w.darling@oxford.ac.uk"
+    author_dict["orcid"] = "0000-0002-5678-9012"
+    data_dict["author"].append(author_dict)
+    data_dict["keywords"] = ["Agelessness", "Identity", "Memory theory"]
+    data_dict["abstract"] = LiteralString(("How does the notion of *agelessness* shape identity? This article examines the **metaphysics** of agelessness through the lens of Peter Pan’s unchanging form and his shifting memories. " * 4).strip())
+    data_dict["author-short"] = SingleQuotedString("Darling, W. M. A.")
+    data_dict["date"] = SingleQuotedString("2024")
+    data_dict["volume"] = "*7*"
+    data_dict["doi"] = SingleQuotedString("10.33735/phimisci.2024.123")
+    return data_dict
+
+def dump_reference(data_dict: Article) -> str:
+    '''yaml.dump() with the pure-Python Dumper (the former emitter).'''
+    return yaml.dump(data_dict, Dumper=yaml.Dumper, allow_unicode=True, default_flow_style=False, explicit_start=True, explicit_end=True, default_style="")
+
+def check_parity(fuzz: int) -> Tuple[List[Article], int]:
+    '''Returns the metadata records for which both emitters differ and the number of dicts emitted by libyaml.'''
+    rng = random.Random(42)
+    inputs = [sample_metadata()] + [random_metadata(rng) for _ in range(fuzz)]
+    emitted_by_libyaml = sum(1 for data_dict in inputs if select_dumper(data_dict) is not yaml.Dumper)
+    return [data_dict for data_dict in inputs if dump_yaml(data_dict) != dump_reference(data_dict)], emitted_by_libyaml
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Parity check and micro-benchmark of the YAML emission.")
+    parser.add_argument("--number", type=int, default=2000, help="Number of calls per timing")
+    parser.add_argument("--fuzz", type=int, default=20000, help="Number of random metadata records for the parity check")
+    args = parser.parse_args()
+    print(f"Emitter: {Dumper.__name__}")
+    mismatches, emitted_by_libyaml = check_parity(args.fuzz)
+    if mismatches:
+        print(f"PARITY FAILED for {len(mismatches)} inputs, e.g.:\n{dump_reference(mismatches[0])}\n{dump_yaml(mismatches[0])}")
+        sys.exit(1)
+    print(f"Parity OK ({args.fuzz + 1} documents, {emitted_by_libyaml} of them emitted by {Dumper.__name__}).")
+    data_dict = sample_metadata()
+    reference = timeit.timeit(lambda: dump_reference(data_dict), number=args.number) / args.number * 1e6
+    current = timeit.timeit(lambda: dump_yaml(data_dict), number=args.number) / args.number * 1e6
+    print(f"{'emitter':<10} {'µs/call':>10}\n{'Dumper':<10} {reference:>10.1f}\n{Dumper.__name__:<10} {current:>10.1f}\nspeed-up: {reference / current:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+'''
+Generator of synthetic OJS XML exports (native import/export format) for benchmarks.
+
+The generated articles vary in the number of authors, the length and HTML density of the abstract, the number of
+keywords and the number and size of the embedded submission_file payloads (base64). With articles > 1 an export
+with several articles (root element articles) is generated. Generation is deterministic for a given seed; the
+payloads are written in chunks, so exports far larger than memory can be generated.
+
+Usage: python benchmarks/ojs_corpus.py <OUTPUT_DIR> [--count N] [--articles N] [--authors N] [--abstract-words N]
+       [--html-density X] [--keywords N] [--files N] [--file-size-kb N] [--seed N]
+'''
+
+import argparse
+import base64
+import os
+import random
+from typing import BinaryIO, List, NamedTuple
+from xml.sax.saxutils import escape
+
+WORDS = ("mind", "consciousness", "perception", "memory", "identity", "agency", "Neverland", "theory", "account",
+         "predictive", "processing", "phenomenal", "self", "body", "time", "ageless", "argue", "model", "the", "of",
+         "and", "in", "we", "that", "is", "a", "this", "article", "examines", "Wörter", "naïve", "Ægir", "café")
+GIVEN_NAMES = ("Wendy", "Peter", "James", "Moira Angela", "John Michael", "Tiger Lily", "Mary", "George", "Ægir", "Zoë")
+FAMILY_NAMES = ("Darling", "Pan", "Hook", "Smee", "Starkey", "Tinker", "Mullins", "Jukes", "Noodler", "Müller")
+ORGANIZATIONS = ("University of Oxford", "SOAS London", "Kensington Gardens", "Ruhr-Universität Bochum", "Neverland Institute")
+# Inline markup OJS stores in titles and abstracts (the opening tag, the closing tag)
+MARKUP = (("<em>", "</em>"), ("<i>", "</i>"), ("<b>", "</b>"), ("<strong>", "</strong>"), ('<span class="x">', "</span>"),
+          ('<a href="https://example.org/?a=1&amp;b=2">', "</a>"), ("<sup>", "</sup>"))
+ENTITIES = ("&amp;", "&nbsp;", "&hellip;", "&#8211;", "&lt;3")
+
+# Raw bytes per payload chunk (multiple of 3, so the base64 chunks can be concatenated)
+PAYLOAD_CHUNK_SIZE: int = 3 * 256 * 1024
+
+
+class CorpusParams(NamedTuple):
+    '''Parameters of a synthetic export.'''
+    articles: int = 1
+    authors: int = 3
+    abstract_words: int = 200
+    # Share of words wrapped in inline markup or followed by an entity (0.0 - 1.0)
+    html_density: float = 0.1
+    keywords: int = 5
+    files: int = 1
+    file_size_kb: int = 64
+    seed: int = 0
+
+
+def html_text(rng: random.Random, words: int, html_density: float, paragraphs: bool = True) -> str:
+    '''Creates random text with inline HTML (as OJS stores it before XML escaping).'''
+    parts: List[str] = list()
+    for idx in range(words):
+        word = rng.choice(WORDS)
+        if rng.random() < html_density:
+            if rng.random() < 0.8:
+                opening, closing = rng.choice(MARKUP)
+                word = opening + word + closing
+            else:
+                word += " " + rng.choice(ENTITIES)
+        parts.append(word)
+        if paragraphs and idx % 80 == 79 and idx != words - 1:
+            parts.append("</p>\n<p>")
+    text = " ".join(parts)
+    return f"<p>{text}</p>" if paragraphs else text
+
+def write_payload(f: BinaryIO, rng: random.Random, size: int) -> None:
+    '''Writes size random bytes as base64 in chunks.'''
+    while size > 0:
+        chunk_size = min(size, PAYLOAD_CHUNK_SIZE)
+        f.write(base64.b64encode(rng.randbytes(chunk_size)))
+        size -= chunk_size
+
+def write_article(f: BinaryIO, rng: random.Random, params: CorpusParams, article_id: int, namespaces: str = "") -> None:
+    '''Writes one article element (submission files, publication with metadata and authors); namespaces for a root article.'''
+    def write(text: str) -> None:
+        f.write(text.encode("utf-8"))
+
+    write(f'<article{namespaces} locale="en_US" date_submitted="2024-01-01" status="3" submission_progress="0" current_publication_id="{article_id}" stage="production">\n')
+    write(f'  <id type="internal" advice="ignore">{article_id}</id>\n')
+    for file_idx in range(params.files):
+        file_id = article_id * 100 + file_idx
+        write(f'  <submission_file id="{file_id}" file_id="{file_id}" stage="submission" genre="Article Text" filename="ms_{file_id}.pdf" viewable="false" uploader="admin">\n')
+        write(f'    <name locale="en_US">ms_{file_id}.pdf</name>\n')
+        write(f'    <file id="{file_id}" filesize="{params.file_size_kb * 1024}" extension="pdf">\n      <embed encoding="base64">')
+        write_payload(f, rng, params.file_size_kb * 1024)
+        write('</embed>\n    </file>\n  </submission_file>\n')
+    write(f'  <publication locale="en_US" version="1" status="3" primary_contact_id="{article_id * 100}" url_path="" seq="0" date_published="2024-03-01" section_ref="ART" access_status="0">\n')
+    write(f'    <id type="internal" advice="ignore">{article_id}</id>\n')
+    write(f'    <id type="doi" advice="update">10.33735/phimisci.2024.{article_id}</id>\n')
+    title = html_text(rng, 8, params.html_density, paragraphs=False) + ": " + html_text(rng, 5, params.html_density, paragraphs=False)
+    write(f'    <title locale="en_US">{escape(title)}</title>\n')
+    write(f'    <abstract locale="en_US">{escape(html_text(rng, params.abstract_words, params.html_density))}</abstract>\n')
+    write('    <licenseUrl>https://creativecommons.org/licenses/by/4.0</licenseUrl>\n')
+    write('    <keywords locale="en_US">\n')
+    for idx in range(params.keywords):
+        write(f'      <keyword>{escape(rng.choice(WORDS))} {idx}</keyword>\n')
+    write('    </keywords>\n    <authors>\n')
+    for idx in range(params.authors):
+        author_id = article_id * 100 + idx
+        write(f'      <author include_in_browse="true" user_group_ref="Author" seq="{idx}" id="{author_id}">\n')
+        write(f'        <givenname locale="en_US">{escape(rng.choice(GIVEN_NAMES))}</givenname>\n')
+        write(f'        <familyname locale="en_US">{escape(rng.choice(FAMILY_NAMES))}</familyname>\n')
+        write(f'        <affiliation locale="en_US">{escape("; ".join(rng.sample(ORGANIZATIONS, rng.randint(1, 2))))}</affiliation>\n')
+        write('        <country>GB</country>\n')
+        write(f'        <email>author{author_id}@example.org</email>\n')
+        if rng.random() < 0.5:
+            write(f'        <orcid>https://orcid.org/0000-0002-{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)}</orcid>\n')
+        write('      </author>\n')
+    write('    </authors>\n')
+    write('    <issue_identification>\n      <volume>7</volume>\n      <year>2024</year>\n    </issue_identification>\n')
+    write('    <pages>1-20</pages>\n  </publication>\n</article>\n')
+
+def write_export(f: BinaryIO, params: CorpusParams) -> None:
+    '''Writes a synthetic OJS XML export with params.articles articles.'''
+    rng = random.Random(params.seed)
+    namespaces = ' xmlns="http://pkp.sfu.ca" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"'
+    f.write(b'<?xml version="1.0" encoding="utf-8"?>\n')
+    if params.articles == 1:
+        # Single-article export: the namespaces are declared on the article element
+        write_article(f, rng, params, 1, namespaces)
+        return
+    f.write(f"<articles{namespaces}>\n".encode("utf-8"))
+    for article_id in range(1, params.articles + 1):
+        write_article(f, rng, params, article_id)
+    f.write(b"</articles>\n")
+
+def generate_export(path: str, params: CorpusParams) -> int:
+    '''Writes a synthetic OJS XML export to path and returns its size in bytes.'''
+    with open(path, "wb") as f:
+        write_export(f, params)
+    return os.path.getsize(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic OJS XML exports for benchmarks.")
+    parser.add_argument("output_dir", type=str, help="Folder for the generated XML files")
+    parser.add_argument("--count", type=int, default=10, help="Number of XML files (default: 10)")
+    defaults = CorpusParams()
+    for name, value in defaults._asdict().items():
+        parser.add_argument("--" + name.replace("_", "-"), type=type(value), default=value, help=f"(default: {value})")
+    args = parser.parse_args()
+    os.makedirs(args.output_dir, exist_ok=True)
+    for idx in range(args.count):
+        params = CorpusParams(**{name: getattr(args, name) for name in defaults._fields if name != "seed"}, seed=args.seed + idx)
+        path = os.path.join(args.output_dir, f"article_{idx + 1:05d}.xml")
+        size = generate_export(path, params)
+        print(f"{path} ({size / 1024:.1f} KB)")
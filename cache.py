@@ -0,0 +1,170 @@
+'''
+Content-addressed on-disk cache for conversions.
+
+A cache entry is keyed by the SHA-256 of the XML bytes, the CLI values (year, volume, ORCID, DOI, output format)
+and the converter version (digest of the converter sources and the PyYAML version), so changing any of them results
+in a cache miss. On a hit the cached YAML documents are written without parsing the XML. The cache is bounded
+in size; the least recently used entries are evicted first. Conversions that use an author registry or extract
+the submission files bypass the cache (see xml2yaml.convert_documents()).
+
+Usage: python cache.py stats <CACHE_DIR> || python cache.py clear <CACHE_DIR>
+'''
+
+import argparse
+import hashlib
+import json
+import os
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from output import locked, write_atomic
+
+# Default size limit of the cache in MB
+DEFAULT_MAX_SIZE_MB: int = 512
+STATS_FILENAME: str = "stats.json"
+ENTRY_EXT: str = ".json"
+# Modules whose code determines the conversion result
+CONVERTER_MODULES = ("xml2yaml.py", "functions.py", "html_sanitizer.py", "xml_stream.py", "yaml_setup.py", "fields.py", "records.py", "registry.py", "submission_files.py")
+
+
+@lru_cache(maxsize=None)
+def converter_version() -> str:
+    '''Returns a digest of the converter sources, the field tables and the PyYAML version (changes invalidate all entries).'''
+    import yaml
+    from fields import describe_fields
+    digest = hashlib.sha256(yaml.__version__.encode("utf-8"))
+    digest.update(describe_fields().encode("utf-8"))
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    for module in CONVERTER_MODULES:
+        with open(os.path.join(base_dir, module), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+class ConversionCache:
+    '''Content-addressed cache of converted YAML documents.
+
+        Parameters
+        ----------
+        cache_dir: str
+            Folder of the cache (created if necessary).
+        max_size_mb: Optional[int] (default: DEFAULT_MAX_SIZE_MB)
+            Size limit of the cache in MB (applied by evict()).
+    '''
+
+    def __init__(self, cache_dir: str, max_size_mb: Optional[int] = None) -> None:
+        self.cache_dir = cache_dir
+        self.max_size = (max_size_mb if max_size_mb is not None else DEFAULT_MAX_SIZE_MB) * 1024 * 1024
+        # Hits and misses of this process (see update_stats())
+        self.hits: int = 0
+        self.misses: int = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def make_key(self, xml_filepath: str, year: Optional[str], volume: Optional[str], orcid: Optional[List[str]], doi: Optional[str], output_format: str = "yaml") -> str:
+        '''Returns the cache key for the XML file, the CLI values and the output format.'''
+        digest = hashlib.sha256()
+        digest.update(converter_version().encode("utf-8"))
+        digest.update(json.dumps([year, volume, orcid, doi, output_format]).encode("utf-8"))
+        with open(xml_filepath, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key + ENTRY_EXT)
+
+    def get(self, key: str) -> Optional[Dict[str, list]]:
+        '''Returns the cached entry for key (or None on a cache miss): the YAML documents and the names of the articles (see put()).'''
+        path = self._entry_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            entry["names"] = entry.get("names") or [dict() for _ in entry["documents"]]
+            # Marking the entry as recently used for the eviction
+            os.utime(path)
+        except (OSError, ValueError, KeyError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def put(self, key: str, documents: List[str], names: Optional[List[Dict[str, Optional[str]]]] = None) -> None:
+        '''Saves the YAML documents of a conversion under key (names: DOI and submission id of every article for the output name templates).'''
+        path = self._entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_atomic(path, json.dumps({"documents": documents, "names": names}, ensure_ascii=False))
+
+    def _entries(self) -> List[os.DirEntry]:
+        entries: List[os.DirEntry] = list()
+        for subdir in os.scandir(self.cache_dir):
+            if subdir.is_dir():
+                entries.extend(entry for entry in os.scandir(subdir.path) if entry.name.endswith(ENTRY_EXT))
+        return entries
+
+    def evict(self) -> int:
+        '''Removes the least recently used entries until the cache fits into its size limit.
+
+            Returns
+            -------
+            int
+                The number of removed entries.
+        '''
+        entries = [(entry.stat().st_mtime, entry.stat().st_size, entry.path) for entry in self._entries()]
+        size = sum(entry[1] for entry in entries)
+        removed = 0
+        for _, entry_size, path in sorted(entries):
+            if size <= self.max_size:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+            removed += 1
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        '''Returns the accumulated hit/miss counts and the current number and size of the entries.'''
+        try:
+            with open(os.path.join(self.cache_dir, STATS_FILENAME), "r", encoding="utf-8") as f:
+                stats = json.load(f)
+        except (OSError, ValueError):
+            stats = {"hits": 0, "misses": 0}
+        entries = self._entries()
+        stats["entries"] = len(entries)
+        stats["size_bytes"] = sum(entry.stat().st_size for entry in entries)
+        return stats
+
+    def update_stats(self, hits: Optional[int] = None, misses: Optional[int] = None) -> None:
+        '''Adds hits and misses (default: the counts of this process) to the accumulated stats.'''
+        path = os.path.join(self.cache_dir, STATS_FILENAME)
+        # Batch workers and watchers of other processes update the same file: read-modify-write under the lock
+        with locked(path):
+            stats = self.stats()
+            stats["hits"] += self.hits if hits is None else hits
+            stats["misses"] += self.misses if misses is None else misses
+            del stats["entries"], stats["size_bytes"]
+            write_atomic(path, json.dumps(stats))
+
+    def clear(self) -> None:
+        '''Removes all entries and the stats.'''
+        for entry in self._entries():
+            os.unlink(entry.path)
+        try:
+            os.unlink(os.path.join(self.cache_dir, STATS_FILENAME))
+        except FileNotFoundError:
+            pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or clear the XML2YAML-OS conversion cache.")
+    parser.add_argument("command", choices=["stats", "clear"], help="stats: print hit/miss counts and size || clear: remove all entries")
+    parser.add_argument("cache_dir", type=str, help="Folder of the cache")
+    args = parser.parse_args()
+    cache = ConversionCache(args.cache_dir)
+    if args.command == "stats":
+        stats = cache.stats()
+        total = stats["hits"] + stats["misses"]
+        hit_rate = stats["hits"] / total * 100 if total > 0 else 0.0
+        print(f"hits: {stats['hits']}\nmisses: {stats['misses']}\nhit rate: {hit_rate:.1f}%\nentries: {stats['entries']}\nsize: {stats['size_bytes'] / 1024 / 1024:.2f} MB")
+    else:
+        cache.clear()
@@ -0,0 +1,23 @@
+'''
+Exceptions of the conversion (raised by the library API in api.py and by the converter functions in xml2yaml.py).
+'''
+
+
+class ConversionError(Exception):
+    '''Base class of all conversion errors.'''
+
+
+class InvalidXMLError(ConversionError):
+    '''The input is not well-formed XML (or has a document type declaration, which is not accepted).'''
+
+
+class NoPublicationDataError(ConversionError):
+    '''The XML contains no article with a publication node.'''
+
+
+class InvalidPublicationError(ConversionError):
+    '''A publication lacks data the metadata cannot be created without (e.g. the authors node or author names).'''
+
+
+class InvalidOptionsError(ConversionError, ValueError):
+    '''The conversion options are invalid (e.g. an unknown output format).'''
@@ -0,0 +1,225 @@
+'''
+Declarative field extraction for the publication node of OJS XML exports.
+
+Every metadata field is an XPath expression (prefix pkp for the OJS namespace) relative to the publication
+(PUBLICATION_FIELDS) or author node (AUTHOR_FIELDS). Fields with multiple=False yield the first matching node (or
+None), fields with multiple=True the list of all matching nodes. Simple paths (pkp:TAG, .//pkp:TAG, optionally
+with one [@ATTRIBUTE='VALUE'] predicate; all default fields) are collected by extract_fields() in a single walk of
+the node's subtree that dispatches on the tag; other expressions are evaluated as precompiled XPath.
+
+The default fields are the ones create_metadata() in xml2yaml.py turns into the PhiMiSci YAML. Further fields can
+be added (or the XPath of a default field overridden) without changing the converter, either in Python via
+add_field() or with a JSON file passed to load_fields() (by the CLI for --fields or the environment variable
+XML2YAML_FIELDS; importing this module only sets up the default fields):
+
+    {"publication": {"pages": {"xpath": "pkp:pages"}}, "author": {"country": {"xpath": "pkp:country"}}}
+
+Added fields are written to the YAML as the stripped text of the matching node(s): publication fields after the
+doi, author fields after the orcid of each author.
+'''
+
+import json
+import re
+from lxml import etree
+from typing import Dict, FrozenSet, List, Optional, Tuple, Union, cast
+
+NAMESPACES: Dict[str, str] = {"pkp": "http://pkp.sfu.ca"}
+
+FieldValue = Union[None, etree._Element, str, List[Union[etree._Element, str]]]
+
+# pkp:TAG (child) or .//pkp:TAG (descendant), optionally with a single [@ATTRIBUTE='VALUE'] predicate
+_SIMPLE_PATH = re.compile(r"^(\.//)?pkp:([A-Za-z_][\w.-]*)(?:\[@([A-Za-z_][\w.-]*)=(?:'([^']*)'|\"([^\"]*)\")\])?$")
+
+
+class Field:
+    '''A metadata field extracted with a precompiled XPath expression.
+
+        Parameters
+        ----------
+        name: str
+            Name of the field (key of the YAML entry for added fields).
+        xpath: str
+            XPath expression relative to the publication (or author) node; must select nodes.
+        multiple: bool (default: False)
+            Whether all matching nodes or only the first one are returned.
+    '''
+
+    __slots__ = ("name", "xpath", "multiple", "expression", "tag", "descendant", "attribute")
+
+    def __init__(self, name: str, xpath: str, multiple: bool = False) -> None:
+        self.name = name
+        self.xpath = xpath
+        self.multiple = multiple
+        # (...)[1] lets libxml2 stop at the first match
+        self.expression = etree.XPath(xpath if multiple else f"({xpath})[1]", namespaces=NAMESPACES)
+        # Simple paths are matched during the walk of extract_fields() (tag None: XPath only)
+        self.tag: Optional[str] = None
+        self.descendant: bool = False
+        self.attribute: Optional[Tuple[str, str]] = None
+        match = _SIMPLE_PATH.match(xpath.strip())
+        if match is not None:
+            self.tag = "{" + NAMESPACES["pkp"] + "}" + match.group(2)
+            self.descendant = match.group(1) is not None
+            if match.group(3) is not None:
+                self.attribute = (match.group(3), match.group(4) if match.group(4) is not None else match.group(5))
+
+    def matches(self, element: etree._Element, node: etree._Element) -> bool:
+        '''Returns True if element (a descendant of node with the tag of the field) is selected by the simple path.'''
+        if not self.descendant and element.getparent() is not node:
+            return False
+        return self.attribute is None or element.get(self.attribute[0]) == self.attribute[1]
+
+    def evaluate(self, node: etree._Element) -> FieldValue:
+        # The expression selects nodes: elements, or strings for text() and attribute steps
+        result = cast(List[Union[etree._Element, str]], self.expression(node))
+        if self.multiple:
+            return result
+        return result[0] if result else None
+
+
+class FieldTable(Dict[str, Field]):
+    '''Field table (name -> Field) that keeps the tag dispatch of its simple-path fields for extract_fields().'''
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._dispatch: Optional[Dict[str, List[Field]]] = None
+
+    def __setitem__(self, name: str, field: Field) -> None:
+        super().__setitem__(name, field)
+        self._dispatch = None
+
+    def __delitem__(self, name: str) -> None:
+        super().__delitem__(name)
+        self._dispatch = None
+
+    def dispatch(self) -> Dict[str, List[Field]]:
+        '''Returns the simple-path fields grouped by tag.'''
+        if self._dispatch is None:
+            dispatch: Dict[str, List[Field]] = dict()
+            for field in self.values():
+                if field.tag is not None:
+                    dispatch.setdefault(field.tag, list()).append(field)
+            self._dispatch = dispatch
+        return self._dispatch
+
+
+class FieldValues(Dict[str, FieldValue]):
+    '''Result of extract_fields() (name -> value) with typed access to the nodes of the default fields.'''
+
+    def node(self, name: str) -> Optional[etree._Element]:
+        '''Returns the element of a single field (None if nothing or no element matched).'''
+        value = self.get(name)
+        return value if isinstance(value, etree._Element) else None
+
+    def nodes(self, name: str) -> List[etree._Element]:
+        '''Returns the elements of a multiple field.'''
+        value = self.get(name)
+        if not isinstance(value, list):
+            return list()
+        return [item for item in value if isinstance(item, etree._Element)]
+
+
+PUBLICATION_FIELDS: Dict[str, Field] = FieldTable({field.name: field for field in (
+    Field("title", "pkp:title"),
+    Field("subtitle", "pkp:subtitle"),
+    Field("abstract", "pkp:abstract"),
+    Field("volume", ".//pkp:volume"),
+    Field("keywords", ".//pkp:keywords"),
+    Field("authors", ".//pkp:authors"),
+    Field("doi", ".//pkp:id[@type='doi']"),
+)})
+AUTHOR_FIELDS: Dict[str, Field] = FieldTable({field.name: field for field in (
+    Field("givenname", ".//pkp:givenname"),
+    Field("familyname", ".//pkp:familyname"),
+    Field("orcid", ".//pkp:orcid"),
+    Field("email", ".//pkp:email"),
+    Field("affiliation", ".//pkp:affiliation", multiple=True),
+)})
+# Fields handled by create_metadata() (all other fields are added to the YAML as text)
+DEFAULT_PUBLICATION_FIELDS: FrozenSet[str] = frozenset(PUBLICATION_FIELDS)
+DEFAULT_AUTHOR_FIELDS: FrozenSet[str] = frozenset(AUTHOR_FIELDS)
+
+
+def extract_fields(node: etree._Element, fields: Dict[str, Field]) -> FieldValues:
+    '''Function to evaluate every field of a field table on node (simple paths in a single walk of its subtree).
+
+        Parameters
+        ----------
+        node: etree._Element
+            The publication or author node.
+        fields: Dict[str, Field]
+            PUBLICATION_FIELDS or AUTHOR_FIELDS.
+
+        Returns
+        -------
+        FieldValues
+            The matching node(s) of every field (in the order of the table); FieldValues.node() and
+            FieldValues.nodes() give the elements of single and multiple fields.
+    '''
+    dispatch = fields.dispatch() if isinstance(fields, FieldTable) else FieldTable(fields).dispatch()
+    found: Dict[str, etree._Element] = dict()
+    found_all: Dict[str, List[Union[etree._Element, str]]] = dict()
+    if dispatch:
+        # iter() visits the descendants in document order, i.e. in the order of the XPath results
+        for element in node.iter(*dispatch):
+            if element is node:
+                continue
+            for field in dispatch[element.tag]:
+                if field.multiple:
+                    if field.matches(element, node):
+                        found_all.setdefault(field.name, list()).append(element)
+                elif field.name not in found and field.matches(element, node):
+                    found[field.name] = element
+    values = FieldValues()
+    for name, field in fields.items():
+        if field.tag is None:
+            values[name] = field.evaluate(node)
+        elif field.multiple:
+            values[name] = found_all.get(name, list())
+        else:
+            values[name] = found.get(name)
+    return values
+
+def field_text(value: FieldValue) -> Union[None, str, List[str]]:
+    '''Function to turn the value of an added field into the stripped text for the YAML.'''
+    if value is None:
+        return None
+    if isinstance(value, list):
+        return [text for text in (field_text(item) for item in value) if isinstance(text, str)]
+    if isinstance(value, str):
+        return str(value).strip()
+    return value.text.strip() if value.text else ""
+
+def add_field(name: str, xpath: str, multiple: bool = False, scope: str = "publication") -> None:
+    '''Function to add a field to (or override a default field of) the publication or author table.
+
+        Parameters
+        ----------
+        name: str
+            Name of the field.
+        xpath: str
+            XPath expression relative to the publication or author node (namespace prefix pkp).
+        multiple: bool (default: False)
+            Whether all matching nodes or only the first one are used.
+        scope: str (default: "publication")
+            "publication" or "author".
+    '''
+    if scope not in ("publication", "author"):
+        raise ValueError(f"Unknown field scope {scope} (publication or author expected).")
+    table = PUBLICATION_FIELDS if scope == "publication" else AUTHOR_FIELDS
+    # Overrides of default fields must keep their shape, create_metadata() relies on it
+    if name in table and name in (DEFAULT_PUBLICATION_FIELDS if scope == "publication" else DEFAULT_AUTHOR_FIELDS) and table[name].multiple != multiple:
+        raise ValueError(f"The default field {name} must be {'multiple' if table[name].multiple else 'single'}.")
+    table[name] = Field(name, xpath, multiple)
+
+def load_fields(path: str) -> None:
+    '''Function to add the fields of a JSON file {"publication": {NAME: {"xpath": XPATH, "multiple": BOOL}}, "author": {...}}.'''
+    with open(path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    for scope in ("publication", "author"):
+        for name, spec in config.get(scope, dict()).items():
+            add_field(name, spec["xpath"], spec.get("multiple", False), scope)
+
+def describe_fields() -> str:
+    '''Returns the field tables as JSON (part of the cache key, see cache.converter_version()).'''
+    return json.dumps({scope: [(field.name, field.xpath, field.multiple) for field in table.values()] for scope, table in (("publication", PUBLICATION_FIELDS), ("author", AUTHOR_FIELDS))})
@@ -2,53 +2,12 @@
 Helper functions for the main script.
 '''
 
-import lxml, re, html
+import lxml.etree, sys
 import logging
-from lxml import etree
-from collections import OrderedDict
-from typing import List, Union, Literal, OrderedDict, Dict, Optional
-from bs4 import BeautifulSoup
+from typing import List, Union, Literal, Dict
+from html_sanitizer import sanitize_html
 
 
-def create_author_dict_4yaml() -> OrderedDict:
-    '''Helper Function for create_yaml_dict() to create author entries.
-    
-        Returns
-        -------
-        OrderedDict
-            An empty OrderedDict with keys for name, affiliation, affsymb, email, orcid.
-    
-    '''
-    author_dict: OrderedDict = OrderedDict()
-    author_dict["name"] = None
-    # Dict {'organization' : <NAME_UNI>} as list entries
-    author_dict["affiliation"] = list()
-    author_dict["email"] = None
-    author_dict["orcid"] = None
-
-    return author_dict
-
-def create_dict_4yaml() -> OrderedDict:
-    '''Function to create an empty YAML dict that can be filled with information form OJS XML.
-
-        Returns
-        -------
-        OrderedDict
-            The empty YAML dict with keys for title, subtitle, author, keywords, tags, abstract, name-short, date, volume, doi.
-    '''
-    pandoc_yaml_dict: OrderedDict = OrderedDict()
-    pandoc_yaml_dict["title"] = None
-    pandoc_yaml_dict["subtitle"] = "" # Empty string because otherwise null appears in template
-    pandoc_yaml_dict["author"] = list()
-    pandoc_yaml_dict["keywords"] = list()
-    pandoc_yaml_dict["abstract"] = None
-    pandoc_yaml_dict["author-short"] = None
-    pandoc_yaml_dict["date"] = None
-    pandoc_yaml_dict["volume"] = None
-    pandoc_yaml_dict["doi"] = None
-
-    return pandoc_yaml_dict
-    
 def create_keywords_4yaml(xml: lxml.etree._Element) -> List[str]:
     '''Function to create a sorted tags list with separate keywords.
 
@@ -67,7 +26,8 @@ def create_keywords_4yaml(xml: lxml.etree._Element) -> List[str]:
     if len(xml) > 0:
         for child in xml:
             text: str = child.text.strip().capitalize() if child.text else ""
-            l.append(text)
+            # Interned: the same keywords recur across a back catalogue
+            l.append(sys.intern(text))
     l.sort()
     return l
 
@@ -84,20 +44,8 @@ def escape_html(input: str) -> str:
         str
             The clean abstract or title.
     '''
-    input = html.unescape(input)
-    # Removing linebreaks
-    input = re.sub(r"\n|\t", "", input)
-    # Removing unnecessary whitespace
-    input = re.sub(r"\s{2,}", " ", input)
-    # Replacing html <b> and <em> with markdown equivalents
-    input = re.sub(r"<em>|</em>", r"*", input)
-    input = re.sub(r"<i>|</i>", r"*", input)
-    input = re.sub(r"<b>|</b>", r"**", input)
-    # Remove remaining HTML tags using BeautifulSoup
-    soup = BeautifulSoup(input, "html.parser")
-    input = soup.get_text()
-
-    return input
+    # Unescaping, whitespace clean-up, <em>/<i>/<b> to markdown and removal of remaining HTML tags (see html_sanitizer.py)
+    return sanitize_html(input)
 
 def parse_given_name(given_name: str, abbr_style: Union[Literal["full"], Literal["light"]] = "light") -> str:
     '''Function to parse a given name string and transform it into an abbreviated format for PhiMiSci pandoc YAML.
@@ -0,0 +1,205 @@
+'''
+HTML-to-markdown text sanitizer for titles and abstracts coming from OJS.
+
+The sanitizer produces exactly the text of the former implementation (html.unescape, whitespace clean-up,
+<em>/<i>/<b> to markdown, remaining tags stripped with BeautifulSoup(..., "html.parser").get_text()) without
+building a BeautifulSoup tree:
+
+1. Text without markup is returned right after the precompiled clean-up patterns.
+2. Text with simple markup only (plain start/end tags, no entities, no script/style-like tags) is stripped with
+   a single precompiled regex.
+3. Everything else goes through a small html.parser subclass that mirrors how BeautifulSoup turns the parser
+   events into text (entity handling, whitespace-only strings, script/style/template/rt/rp contents).
+'''
+
+import html
+import re
+from html.entities import html5
+from html.parser import HTMLParser
+from typing import Dict, List
+
+# Characters BeautifulSoup considers whitespace when normalising whitespace-only strings
+ASCII_SPACES: str = "\x20\x0a\x09\x0c\x0d"
+
+# Tags whose strings BeautifulSoup stores as special string classes which get_text() ignores
+STRING_CONTAINER_TAGS = frozenset(("rt", "rp", "style", "script", "template"))
+# Tags in which BeautifulSoup keeps whitespace-only strings as they are
+PRESERVE_WHITESPACE_TAGS = frozenset(("pre", "textarea"))
+# Empty-element tags which BeautifulSoup closes right away
+EMPTY_ELEMENT_TAGS = frozenset((
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "keygen", "link", "menuitem", "meta", "param",
+    "source", "track", "wbr", "basefont", "bgsound", "command", "frame", "image", "isindex", "nextid", "spacer",
+))
+
+# Named entities without trailing semicolon (first name wins, same as bs4.dammit.EntitySubstitution)
+ENTITY_TO_CHARACTER: Dict[str, str] = dict()
+for _name, _character in sorted(html5.items()):
+    ENTITY_TO_CHARACTER.setdefault(_name[:-1] if _name.endswith(";") else _name, _character)
+
+_WHITESPACE = re.compile(r"\s\s+")
+_MARKDOWN_TAGS = re.compile(r"</?(em|i|b)>")
+_MARKDOWN = {"em": "*", "i": "*", "b": "**"}
+# Anything that is not a plain tag (optionally with simple double-quoted attributes) or plain text: entity
+# references, other markup, whitespace BeautifulSoup normalises and tags with special string classes
+_NOT_SIMPLE_MARKUP = re.compile(
+    r'[\r\x0c]|&(?!\s)'
+    r'|<(?!/[a-zA-Z][a-zA-Z0-9]*>|[a-zA-Z][a-zA-Z0-9]*(?: +[a-zA-Z][-a-zA-Z0-9]*="[^"<>&]*")* */?>)'
+    r'|(?i:</?(?:rt|rp|style|script|template)\b)'
+)
+_TAG = re.compile(r"<[^>]*>")
+
+
+def _markdown_tag(match: "re.Match[str]") -> str:
+    return _MARKDOWN[match.group(1)]
+
+def sanitize_html(text: str) -> str:
+    '''Function to turn OJS HTML (title, abstract) into plain text with markdown emphasis.
+
+        Parameters
+        ----------
+        text: str
+            The raw text coming from OJS XML.
+
+        Returns
+        -------
+        str
+            The clean text.
+    '''
+    text = html.unescape(text)
+    # Removing linebreaks and unnecessary whitespace
+    text = _WHITESPACE.sub(" ", text.replace("\n", "").replace("\t", ""))
+    # Replacing html <em>, <i> and <b> with markdown equivalents
+    text = _MARKDOWN_TAGS.sub(_markdown_tag, text)
+    if "<" not in text and "&" not in text:
+        # A whitespace-only string is normalised to a single space (as in BeautifulSoup)
+        if text != "" and text.strip(ASCII_SPACES) == "":
+            return "\n" if "\n" in text else " "
+        return text
+    if not _NOT_SIMPLE_MARKUP.search(text):
+        return _TAG.sub("", text)
+    extractor = TextExtractor()
+    extractor.feed(text)
+    return extractor.get_text()
+
+
+class TextExtractor(HTMLParser):
+    '''html.parser subclass collecting the text BeautifulSoup(..., "html.parser").get_text() would return.'''
+
+    def __init__(self) -> None:
+        # BeautifulSoup resolves character references itself
+        super().__init__(convert_charrefs=False)
+        self.text_parts: List[str] = list()
+        # Data of the current string (split up by entity references)
+        self.current_data: List[str] = list()
+        # Open tags and the positions of open string container/whitespace preserving tags in that stack
+        self.tag_stack: List[str] = list()
+        self.open_tag_counter: Dict[str, int] = dict()
+        self.string_container_stack: List[int] = list()
+        self.preserve_whitespace_stack: List[int] = list()
+        self.already_closed_empty_element: List[str] = list()
+
+    def get_text(self) -> str:
+        '''Closes the parser and returns the collected text.'''
+        self.close()
+        self.end_data()
+        return "".join(self.text_parts)
+
+    def end_data(self, is_cdata: bool = False) -> None:
+        '''Finishes the current string and keeps it if get_text() would return it.'''
+        if not self.current_data:
+            return
+        data = "".join(self.current_data)
+        self.current_data = list()
+        if not self.preserve_whitespace_stack and data.strip(ASCII_SPACES) == "":
+            data = "\n" if "\n" in data else " "
+        if is_cdata or not self.string_container_stack:
+            self.text_parts.append(data)
+
+    def push_tag(self, name: str) -> None:
+        self.tag_stack.append(name)
+        self.open_tag_counter[name] = self.open_tag_counter.get(name, 0) + 1
+        if name in PRESERVE_WHITESPACE_TAGS:
+            self.preserve_whitespace_stack.append(len(self.tag_stack) - 1)
+        if name in STRING_CONTAINER_TAGS:
+            self.string_container_stack.append(len(self.tag_stack) - 1)
+
+    def pop_tag(self) -> None:
+        position = len(self.tag_stack) - 1
+        name = self.tag_stack.pop()
+        self.open_tag_counter[name] -= 1
+        if self.preserve_whitespace_stack and self.preserve_whitespace_stack[-1] == position:
+            self.preserve_whitespace_stack.pop()
+        if self.string_container_stack and self.string_container_stack[-1] == position:
+            self.string_container_stack.pop()
+
+    def pop_to_tag(self, name: str) -> None:
+        '''Pops the tag stack up to and including the most recent tag with the given name (if there is one).'''
+        if not self.open_tag_counter.get(name):
+            return
+        while self.tag_stack:
+            if self.tag_stack[-1] == name:
+                self.pop_tag()
+                return
+            self.pop_tag()
+
+    def handle_starttag(self, tag: str, attrs: list, handle_empty_element: bool = True) -> None:
+        self.end_data()
+        self.push_tag(tag)
+        if tag in EMPTY_ELEMENT_TAGS and handle_empty_element:
+            self.handle_endtag(tag, check_already_closed=False)
+            self.already_closed_empty_element.append(tag)
+
+    def handle_startendtag(self, tag: str, attrs: list) -> None:
+        self.handle_starttag(tag, attrs, handle_empty_element=False)
+        self.handle_endtag(tag)
+
+    def handle_endtag(self, tag: str, check_already_closed: bool = True) -> None:
+        if check_already_closed and tag in self.already_closed_empty_element:
+            self.already_closed_empty_element.remove(tag)
+        else:
+            self.end_data()
+            self.pop_to_tag(tag)
+
+    def handle_data(self, data: str) -> None:
+        self.current_data.append(data)
+
+    def handle_charref(self, name: str) -> None:
+        if name.startswith("x"):
+            codepoint = int(name.lstrip("x"), 16)
+        elif name.startswith("X"):
+            codepoint = int(name.lstrip("X"), 16)
+        else:
+            codepoint = int(name)
+        data = None
+        # Numeric references < 256 are read as windows-1252 (e.g. &#147; for a left double quotation mark)
+        if codepoint < 256:
+            try:
+                data = bytearray([codepoint]).decode("windows-1252")
+            except UnicodeDecodeError:
+                pass
+        if not data:
+            try:
+                data = chr(codepoint)
+            except (ValueError, OverflowError):
+                pass
+        self.handle_data(data or "\N{REPLACEMENT CHARACTER}")
+
+    def handle_entityref(self, name: str) -> None:
+        character = ENTITY_TO_CHARACTER.get(name)
+        self.handle_data(character if character is not None else "&" + name)
+
+    def handle_comment(self, data: str) -> None:
+        self.end_data()
+
+    def handle_decl(self, decl: str) -> None:
+        self.end_data()
+
+    def handle_pi(self, data: str) -> None:
+        self.end_data()
+
+    def unknown_decl(self, data: str) -> None:
+        self.end_data()
+        # CDATA sections are part of the text, other declarations are not
+        if data.upper().startswith("CDATA["):
+            self.current_data.append(data[len("CDATA["):])
+            self.end_data(is_cdata=True)
@@ -0,0 +1,153 @@
+'''
+Writing of the output files: naming templates, atomic replacement and optional locking.
+
+Every output file is written to a temporary file in the target folder and then renamed onto its path, so readers
+(e.g. the typesetter) only ever see complete files, and a crash in the middle of a dump leaves the previous file
+(plus a hidden .<NAME>.*.tmp file) instead of a truncated one; the temporary file is synced to disk before the
+rename, so this also holds after a power failure. Several processes or containers can therefore write
+into the same output folder at the same time. With --lock, the write and rename of each file additionally hold an
+exclusive flock on <FILE>.lock, so cooperating writers and readers (flock -s <FILE>.lock cat <FILE>) are serialised.
+
+With --name-template the files are named after the articles instead of the input file, e.g. {doi} or
+{submission_id}_{stem}. The placeholders are listed in TEMPLATE_FIELDS; characters that are not allowed in file
+names (e.g. the / of DOIs) are replaced by _.
+'''
+
+import logging
+import os
+import re
+import string
+import tempfile
+from contextlib import contextmanager
+from typing import IO, Any, BinaryIO, ContextManager, Dict, Iterator, Literal, Optional, TextIO, overload
+
+# Placeholders of the name templates
+TEMPLATE_FIELDS: Dict[str, str] = {
+    "stem": "file name of the input XML without extension (stdin when reading from stdin)",
+    "doi": "DOI of the article",
+    "submission_id": "internal OJS id of the article (submission)",
+    "article": "position of the article in the export (starting with 1)",
+}
+LOCK_SUFFIX: str = ".lock"
+
+_UNSAFE_CHARACTERS = re.compile(r"[^\w.-]+")
+_file_mode: Optional[int] = None
+
+
+def check_name_template(template: str) -> None:
+    '''Raises ValueError if template is not a valid name template (unknown placeholder, format spec, path).'''
+    if template == "" or os.sep in template or (os.altsep is not None and os.altsep in template):
+        raise ValueError(f"Invalid name template {template!r}: the template names a file in the output folder")
+    try:
+        placeholders = [(field, spec, conversion) for _, field, spec, conversion in string.Formatter().parse(template) if field is not None]
+    except ValueError as e:
+        raise ValueError(f"Invalid name template {template!r}: {e}") from None
+    for field, spec, conversion in placeholders:
+        if field not in TEMPLATE_FIELDS:
+            raise ValueError(f"Invalid name template {template!r}: unknown placeholder {{{field}}} (expected one of {', '.join('{' + name + '}' for name in TEMPLATE_FIELDS)})")
+        # All values are strings: a format spec like {article:03d} would only fail while the files are written
+        if spec or conversion:
+            raise ValueError(f"Invalid name template {template!r}: the placeholder {{{field}}} takes no format spec or conversion")
+
+def safe_file_name(name: str) -> str:
+    '''Returns name with the characters that are not allowed in file names (e.g. /) replaced by _ (empty if nothing is left).'''
+    return _UNSAFE_CHARACTERS.sub("_", name).strip("._")
+
+def format_name(template: str, stem: str, article: int, names: Dict[str, Optional[str]]) -> str:
+    '''Function to create the file name (without extension) of an article from a name template.
+
+        Parameters
+        ----------
+        template: str
+            The name template (see check_name_template()).
+        stem: str
+            File name of the input XML without extension.
+        article: int
+            Position of the article in the export (starting with 1).
+        names: Dict[str, Optional[str]]
+            The doi and submission_id of the article; missing values are replaced by <stem>_<article>.
+
+        Returns
+        -------
+        str
+            The file name with unsafe characters replaced by _.
+    '''
+    values = {"stem": stem, "article": str(article)}
+    for field in ("doi", "submission_id"):
+        value = names.get(field)
+        values[field] = value if value else f"{stem}_{article}"
+    return safe_file_name(template.format(**values)) or f"{stem}_{article}"
+
+def _default_file_mode() -> int:
+    # mkstemp creates files with mode 0600; output files get the usual mode of new files (0666 minus umask)
+    global _file_mode
+    if _file_mode is None:
+        umask = os.umask(0)
+        os.umask(umask)
+        _file_mode = 0o666 & ~umask
+    return _file_mode
+
+@contextmanager
+def locked(path: str, lock: bool = True) -> Iterator[None]:
+    '''Context manager holding an exclusive flock on <path>.lock (no-op if lock is False or flock is not available).'''
+    if not lock:
+        yield
+        return
+    try:
+        import fcntl
+    except ImportError:
+        logging.warning("File locking is not available on this system; writing without lock.")
+        yield
+        return
+    with open(path + LOCK_SUFFIX, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+# Text file (str) by default, binary file (bytes) with binary=True
+@overload
+def atomic_open(path: str, lock: bool = False, binary: Literal[False] = False) -> ContextManager[TextIO]: ...
+@overload
+def atomic_open(path: str, lock: bool = False, *, binary: Literal[True]) -> ContextManager[BinaryIO]: ...
+
+@contextmanager
+def atomic_open(path: str, lock: bool = False, binary: bool = False) -> Iterator[Any]:
+    '''Context manager yielding a temporary file that replaces path when the block is left without error.
+
+        Parameters
+        ----------
+        path: str
+            The output file.
+        lock: bool (default: False)
+            Hold an exclusive flock on <path>.lock while the file is written and renamed.
+        binary: bool (default: False)
+            Open the file in binary mode instead of as UTF-8 text.
+    '''
+    with locked(path, lock):
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+        try:
+            os.chmod(tmp_path, _default_file_mode())
+            f: IO[Any]
+            if binary:
+                f = os.fdopen(fd, "wb")
+            else:
+                f = os.fdopen(fd, "w", encoding="utf-8")
+            with f:
+                yield f
+                # The data has to be on disk before the rename, or a crash can leave an empty file under path
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+def write_atomic(path: str, text: str, lock: bool = False) -> None:
+    '''Function to replace path with text atomically (see atomic_open()).'''
+    with atomic_open(path, lock) as f:
+        f.write(text)
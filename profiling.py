@@ -0,0 +1,194 @@
+'''
+Per-stage timing and memory spans of conversions.
+
+Once profiling is turned on with enable() (the CLI does so for --profile or the environment variable
+XML2YAML_PROFILE; importing this module never does), every stage of a conversion (cache lookup, streaming parse
+incl. dropping the submission files, field extraction, escape_html, author loop, YAML emission, writing) is
+recorded as a span and emitted as one JSON line, e.g.
+
+    {"stage": "metadata.authors", "seconds": 0.000412, "peak_kb": 18.2, "max_rss_kb": 31240, "pid": 812, "file": "article.xml", "article": 1}
+
+peak_kb is the peak of the Python allocations during the span above the allocations at its start (tracemalloc;
+enable(memory=False) or XML2YAML_PROFILE_MEMORY=0 for the CLI turn it off, as it slows down the Python parts), max_rss_kb the peak RSS of the
+process so far (includes lxml's allocations). Nested spans inherit the attributes (file, article) of the enclosing
+spans.
+
+Callers converting many articles in one process can register hooks (add_hook()) that receive every span, e.g.
+StageStats for percentiles per stage. Recorded files can be summarised with: python profiling.py <PROFILE_FILE>
+'''
+
+import json
+import os
+import resource
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+from typing import IO, Callable, Dict, Iterator, List, Optional, Sequence, Union
+
+Span = Dict[str, Union[str, int, float, None]]
+
+
+class OpenSpan:
+    '''A span in progress: its attributes (inherited by nested spans), the Python allocations at its start and the
+    peak of the Python allocations of its finished children.'''
+
+    __slots__ = ("attributes", "start_memory", "children_peak")
+
+    def __init__(self, attributes: Span, start_memory: int) -> None:
+        self.attributes = attributes
+        self.start_memory = start_memory
+        self.children_peak = 0
+
+
+class Profiler:
+    '''Records spans and passes them on to the output (JSON lines) and the hooks.
+
+        Parameters
+        ----------
+        output: Optional[IO[str]]
+            Stream for the JSON lines (None: hooks only).
+        memory: bool (default: True)
+            Whether the peak of the Python allocations per span is measured with tracemalloc.
+    '''
+
+    def __init__(self, output: Optional[IO[str]] = None, memory: bool = True) -> None:
+        self.output = output
+        self.memory = memory
+        self.hooks: List[Callable[[Span], None]] = list()
+        self.stack: List[OpenSpan] = list()
+        if memory:
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            self.tracemalloc = tracemalloc
+
+    @contextmanager
+    def span(self, stage: str, **attributes: Union[str, int, float, None]) -> Iterator[None]:
+        inherited: Span = dict(self.stack[-1].attributes) if self.stack else dict()
+        inherited.update(attributes)
+        current = 0
+        if self.memory:
+            current, peak = self.tracemalloc.get_traced_memory()
+            if self.stack:
+                self.stack[-1].children_peak = max(self.stack[-1].children_peak, peak)
+            self.tracemalloc.reset_peak()
+        entry = OpenSpan(inherited, current)
+        self.stack.append(entry)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.stack.pop()
+            record: Span = {"stage": stage, "seconds": round(seconds, 6)}
+            if self.memory:
+                peak = max(entry.children_peak, self.tracemalloc.get_traced_memory()[1])
+                record["peak_kb"] = round(max(peak - entry.start_memory, 0) / 1024, 1)
+                if self.stack:
+                    self.stack[-1].children_peak = max(self.stack[-1].children_peak, peak)
+                self.tracemalloc.reset_peak()
+            record["max_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            record["pid"] = os.getpid()
+            record.update(inherited)
+            self.emit(record)
+
+    def emit(self, record: Span) -> None:
+        if self.output is not None:
+            # One write per line (the file is opened in append mode, so lines of worker processes do not mix)
+            self.output.write(json.dumps(record) + "\n")
+            self.output.flush()
+        for hook in self.hooks:
+            hook(record)
+
+
+class StageStats:
+    '''Aggregates spans per stage (use as hook: add_hook(stats.add)).'''
+
+    def __init__(self) -> None:
+        self.seconds: Dict[str, List[float]] = dict()
+        self.peak_kb: Dict[str, List[float]] = dict()
+
+    def add(self, record: Span) -> None:
+        stage = str(record["stage"])
+        self.seconds.setdefault(stage, list()).append(float(record["seconds"] or 0))
+        if record.get("peak_kb") is not None:
+            self.peak_kb.setdefault(stage, list()).append(float(record["peak_kb"] or 0))
+
+    def summary(self, percentiles: Sequence[int] = (50, 90, 99)) -> Dict[str, Dict[str, float]]:
+        '''Returns count, total and percentiles of the seconds (and the maximum peak_kb) per stage.'''
+        summary: Dict[str, Dict[str, float]] = dict()
+        for stage, values in self.seconds.items():
+            values = sorted(values)
+            entry: Dict[str, float] = {"count": len(values), "total_seconds": round(sum(values), 6)}
+            for percentile in percentiles:
+                # Nearest-rank percentile
+                entry[f"p{percentile}_seconds"] = values[max(0, -(-percentile * len(values) // 100) - 1)]
+            if stage in self.peak_kb:
+                entry["max_peak_kb"] = max(self.peak_kb[stage])
+            summary[stage] = entry
+        return summary
+
+
+_profiler: Optional[Profiler] = None
+_NOT_PROFILING = nullcontext()
+
+
+def enable(destination: Optional[str] = None, memory: bool = True) -> Profiler:
+    '''Function to turn on profiling.
+
+        Parameters
+        ----------
+        destination: Optional[str]
+            "1", "-" or "stderr" for stderr, otherwise the path of a file the JSON lines are appended to
+            (None: no output, spans only go to the hooks).
+        memory: bool (default: True)
+            Whether the peak of the Python allocations per span is measured.
+
+        Returns
+        -------
+        Profiler
+            The active profiler (hooks can be added to profiler.hooks).
+    '''
+    global _profiler
+    # A worker process enables profiling again after fork(): the output inherited from the parent is closed
+    disable()
+    output: Optional[IO[str]] = None
+    if destination in ("1", "-", "stderr"):
+        output = sys.stderr
+    elif destination is not None:
+        output = open(destination, "a", encoding="utf-8")
+    _profiler = Profiler(output, memory)
+    return _profiler
+
+def disable() -> None:
+    global _profiler
+    if _profiler is not None:
+        output = _profiler.output
+        if output is not None and output is not sys.stderr:
+            output.close()
+    _profiler = None
+
+def add_hook(hook: Callable[[Span], None]) -> None:
+    '''Function to pass every span to hook (turns on profiling without output if it is off; call enable(None,
+    memory=False) first for timings only).'''
+    profiler = _profiler if _profiler is not None else enable()
+    profiler.hooks.append(hook)
+
+def span(stage: str, **attributes: Union[str, int, float, None]):
+    '''Context manager recording stage as span (does nothing if profiling is off).'''
+    if _profiler is None:
+        return _NOT_PROFILING
+    return _profiler.span(stage, **attributes)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Summarise recorded XML2YAML-OS profiles (percentiles per stage).")
+    parser.add_argument("profile_file", type=str, help="File with the JSON lines of --profile")
+    args = parser.parse_args()
+    stats = StageStats()
+    with open(args.profile_file, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                stats.add(json.loads(line))
+    print(json.dumps(stats.summary(), indent=2))
@@ -0,0 +1,128 @@
+'''
+Compact records of the article metadata (article, authors, affiliations).
+
+create_metadata() used to build every article from nested OrderedDicts plus one dict per affiliation. When whole
+back catalogues are kept in memory, the per-object overhead of these dicts adds up; the slotted records below need a
+fraction of it, and affiliation and keyword strings are interned, so repeated values are stored once. The YAML keys
+are only defined here (FIELDS of every record). The records keep the dict interface of the
+former dicts (record["author-short"], items(), ...) and are serialised by the representers in yaml_setup.py with
+the same keys in the same order, so the YAML and JSON output does not change.
+'''
+
+import sys
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+class Record:
+    '''Base class of the records: the YAML keys are stored in slots, additional fields (see fields.py) in extra.'''
+
+    __slots__ = ("extra",)
+    # Additional fields in output order (None if there are none)
+    extra: Optional[Dict[str, Any]]
+    # (YAML key, slot name) in output order
+    FIELDS: Tuple[Tuple[str, str], ...] = ()
+    SLOTS: Dict[str, str] = dict()
+
+    def __init_subclass__(cls) -> None:
+        cls.SLOTS = dict(cls.FIELDS)
+
+    def __getitem__(self, key: str) -> Any:
+        slot = self.SLOTS.get(key)
+        if slot is not None:
+            return getattr(self, slot)
+        if self.extra is None:
+            raise KeyError(key)
+        return self.extra[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        slot = self.SLOTS.get(key)
+        if slot is not None:
+            setattr(self, slot, value)
+        else:
+            if self.extra is None:
+                self.extra = dict()
+            self.extra[key] = value
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.SLOTS or (self.extra is not None and key in self.extra)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys())
+
+    def __len__(self) -> int:
+        return len(self.FIELDS) + (len(self.extra) if self.extra is not None else 0)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, (Record, dict)):
+            return NotImplemented
+        return self.items() == list(other.items())
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({dict(self.items())!r})"
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self) -> List[str]:
+        keys = [key for key, _ in self.FIELDS]
+        if self.extra is not None:
+            keys.extend(self.extra)
+        return keys
+
+    def items(self) -> List[Tuple[str, Any]]:
+        '''Returns the (YAML key, value) pairs in output order (fixed keys first, then additional fields).'''
+        items = [(key, getattr(self, slot)) for key, slot in self.FIELDS]
+        if self.extra is not None:
+            items.extend(self.extra.items())
+        return items
+
+
+class Affiliation(Record):
+    '''Affiliation of an author (YAML: {organization: <NAME>}); the name is interned.'''
+
+    __slots__ = ("organization",)
+    FIELDS = (("organization", "organization"),)
+
+    def __init__(self, organization: str) -> None:
+        self.extra = None
+        self.organization = sys.intern(organization)
+
+
+class Author(Record):
+    '''Author entry (YAML keys name, affiliation, email, orcid).'''
+
+    __slots__ = ("name", "affiliation", "email", "orcid")
+    FIELDS = (("name", "name"), ("affiliation", "affiliation"), ("email", "email"), ("orcid", "orcid"))
+
+    def __init__(self) -> None:
+        self.extra = None
+        self.name: Optional[str] = None
+        self.affiliation: List[Affiliation] = list()
+        self.email: Optional[str] = None
+        self.orcid: Optional[str] = None
+
+
+class Article(Record):
+    '''Metadata of an article (the YAML keys of FIELDS, then the additional fields).'''
+
+    __slots__ = ("title", "subtitle", "author", "keywords", "abstract", "author_short", "date", "volume", "doi")
+    FIELDS = (("title", "title"), ("subtitle", "subtitle"), ("author", "author"), ("keywords", "keywords"), ("abstract", "abstract"),
+              ("author-short", "author_short"), ("date", "date"), ("volume", "volume"), ("doi", "doi"))
+
+    def __init__(self) -> None:
+        self.extra = None
+        self.title: Optional[str] = None
+        # Empty string because otherwise null appears in template
+        self.subtitle: str = ""
+        self.author: List[Author] = list()
+        self.keywords: List[str] = list()
+        self.abstract: Optional[str] = None
+        self.author_short: Optional[str] = None
+        self.date: Optional[str] = None
+        self.volume: Optional[str] = None
+        self.doi: Optional[str] = None
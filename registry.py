@@ -0,0 +1,265 @@
+'''
+Persistent author registry (SQLite) for back-filling ORCIDs and affiliations.
+
+With --registry <DB> (or the environment variable XML2YAML_REGISTRY), every converted article adds its authors
+(name, ORCID, affiliations, email) to the registry, and authors without ORCID or affiliations in the XML (and
+without --orcid) get them from the registry. Authors are indexed by their normalised name (case, accents,
+punctuation and whitespace ignored) and by ORCID, so lookups stay fast for large registries. Names shared by
+several registered authors with different ORCIDs are not back-filled.
+
+Usage: python registry.py import <DB> <FILE.csv|FILE.json> || python registry.py export <DB> <FILE.csv|FILE.json>
+       || python registry.py stats <DB>
+
+CSV files have the columns given_name, family_name, orcid, affiliations (separated by ";"), email.
+'''
+
+import json
+import os
+import re
+import sqlite3
+import unicodedata
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+CSV_COLUMNS = ("given_name", "family_name", "orcid", "affiliations", "email")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS authors (
+    id INTEGER PRIMARY KEY,
+    name_key TEXT NOT NULL,
+    given_name TEXT NOT NULL,
+    family_name TEXT NOT NULL,
+    orcid TEXT,
+    affiliations TEXT NOT NULL DEFAULT '[]',
+    email TEXT
+);
+CREATE INDEX IF NOT EXISTS authors_name_key ON authors (name_key);
+CREATE UNIQUE INDEX IF NOT EXISTS authors_orcid ON authors (orcid) WHERE orcid IS NOT NULL;
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('revision', 0);
+"""
+
+_NOT_ALNUM = re.compile(r"[\W_]+")
+
+
+class Author(NamedTuple):
+    '''An author of the registry.'''
+    given_name: str
+    family_name: str
+    orcid: Optional[str] = None
+    affiliations: Sequence[str] = ()
+    email: Optional[str] = None
+
+
+def normalise_name(given_name: str, family_name: str) -> str:
+    '''Function to create the lookup key of a name ("Zoë  O'Brien" and "zoe obrien" give the same key).'''
+    name = unicodedata.normalize("NFKD", f"{given_name} {family_name}")
+    name = "".join(character for character in name if not unicodedata.combining(character))
+    return " ".join(_NOT_ALNUM.sub(" ", name.replace("'", "").replace("’", "")).casefold().split())
+
+def normalise_orcid(orcid: Optional[str]) -> Optional[str]:
+    '''Function to strip the URL prefix (https://orcid.org/) and whitespace from an ORCID.'''
+    if orcid is None:
+        return None
+    orcid = orcid.strip().split("/")[-1]
+    return orcid if orcid != "" else None
+
+
+class AuthorRegistry:
+    '''SQLite-backed author registry.
+
+        Parameters
+        ----------
+        db_path: str
+            Path of the SQLite database (created if necessary).
+    '''
+
+    def __init__(self, db_path: str) -> None:
+        self.db_path = db_path
+        # Batch workers write concurrently: waiting for locks instead of failing, WAL for concurrent readers;
+        # transactions are begun explicitly (see add_authors())
+        self.connection = sqlite3.connect(db_path, timeout=60, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def revision(self) -> int:
+        '''Returns a counter that is increased by every change of the registry (shown by python registry.py stats).'''
+        return self.connection.execute("SELECT value FROM meta WHERE key = 'revision'").fetchone()[0]
+
+    def lookup(self, given_name: str, family_name: str) -> Optional[Author]:
+        '''Returns the registered author with this name (None if there is none or the name is ambiguous).'''
+        rows = self.connection.execute("SELECT given_name, family_name, orcid, affiliations, email FROM authors WHERE name_key = ? LIMIT 2", (normalise_name(given_name, family_name),)).fetchall()
+        if len(rows) != 1:
+            return None
+        return _row_to_author(rows[0])
+
+    def add_authors(self, authors: Iterable[Author]) -> int:
+        '''Adds or updates authors in a single transaction and returns the number of changed entries.
+
+            An author is matched by ORCID first, then by normalised name (an entry without ORCID or with the same
+            ORCID). Missing ORCIDs, emails and affiliations of existing entries are filled; known affiliations are
+            replaced by newer non-empty ones.
+        '''
+        changed = 0
+        # BEGIN IMMEDIATE takes the write lock before the lookups of _add_author(), so that no other worker can insert
+        # the same ORCID between its SELECT and INSERT (a deferred transaction only locks at the first write)
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            for author in authors:
+                changed += self._add_author(author)
+            if changed > 0:
+                self.connection.execute("UPDATE meta SET value = value + 1 WHERE key = 'revision'")
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+        self.connection.execute("COMMIT")
+        return changed
+
+    def _add_author(self, author: Author) -> int:
+        name_key = normalise_name(author.given_name, author.family_name)
+        orcid = normalise_orcid(author.orcid)
+        row = None
+        if orcid is not None:
+            row = self.connection.execute("SELECT id, orcid, affiliations, email FROM authors WHERE orcid = ?", (orcid,)).fetchone()
+        if row is None:
+            rows = self.connection.execute("SELECT id, orcid, affiliations, email FROM authors WHERE name_key = ?", (name_key,)).fetchall()
+            if orcid is not None:
+                # Same name with another ORCID: a different person
+                rows = [candidate for candidate in rows if candidate[1] is None]
+            if len(rows) > 1:
+                # Ambiguous name, nothing to update
+                return 0
+            row = rows[0] if rows else None
+        affiliations = json.dumps(list(author.affiliations), ensure_ascii=False)
+        if row is None:
+            self.connection.execute(
+                "INSERT INTO authors (name_key, given_name, family_name, orcid, affiliations, email) VALUES (?, ?, ?, ?, ?, ?)",
+                (name_key, author.given_name, author.family_name, orcid, affiliations, author.email),
+            )
+            return 1
+        author_id, known_orcid, known_affiliations, known_email = row
+        new_orcid = known_orcid or orcid
+        new_affiliations = affiliations if author.affiliations else known_affiliations
+        new_email = author.email or known_email
+        if (new_orcid, new_affiliations, new_email) == (known_orcid, known_affiliations, known_email):
+            return 0
+        self.connection.execute("UPDATE authors SET orcid = ?, affiliations = ?, email = ? WHERE id = ?", (new_orcid, new_affiliations, new_email, author_id))
+        return 1
+
+    def export_authors(self) -> List[Author]:
+        return [_row_to_author(row) for row in self.connection.execute("SELECT given_name, family_name, orcid, affiliations, email FROM authors ORDER BY family_name, given_name, id")]
+
+    def stats(self) -> Dict[str, int]:
+        authors, with_orcid = self.connection.execute("SELECT COUNT(*), COUNT(orcid) FROM authors").fetchone()
+        return {"authors": authors, "with_orcid": with_orcid, "revision": self.revision()}
+
+
+def _row_to_author(row: tuple) -> Author:
+    return Author(row[0], row[1], row[2], json.loads(row[3]), row[4])
+
+
+_registry: Optional[AuthorRegistry] = None
+_registry_pid: Optional[int] = None
+# Path of the registry database of the conversions in this process (set by the CLI with --registry)
+_db_path: Optional[str] = None
+
+def configure(db_path: Optional[str]) -> None:
+    '''Function to set the registry database of the conversions in this process (None: no registry).'''
+    global _db_path
+    _db_path = db_path
+
+def configured_path() -> Optional[str]:
+    '''Returns the path of the registry database set with configure() (None if no registry is set).'''
+    return _db_path
+
+def get_registry() -> Optional[AuthorRegistry]:
+    '''Returns the registry set with configure() (one connection per process) or None if no registry is set.'''
+    global _registry, _registry_pid
+    db_path = _db_path
+    if not db_path:
+        return None
+    # SQLite connections must not be shared with forked worker processes
+    if _registry is None or _registry_pid != os.getpid() or _registry.db_path != db_path:
+        _registry = AuthorRegistry(db_path)
+        _registry_pid = os.getpid()
+    return _registry
+
+def import_file(registry: AuthorRegistry, path: str) -> int:
+    '''Function to add the authors of a CSV or JSON file (list of objects with the CSV columns as keys).
+
+        Raises ValueError (before anything is added) if an entry lacks a name or has values of the wrong type.
+    '''
+    if path.endswith(".json"):
+        with open(path, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+    else:
+        import csv
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            entries = list(csv.DictReader(f))
+    if not isinstance(entries, list):
+        raise ValueError(f"{path}: expected a list of authors")
+    authors: List[Author] = list()
+    for idx, entry in enumerate(entries, 1):
+        authors.append(_entry_to_author(entry, f"{path}, author {idx}"))
+    return registry.add_authors(authors)
+
+def _entry_to_author(entry: object, location: str) -> Author:
+    '''Validates an entry of an import file; raises ValueError with the location of the entry if it is invalid.'''
+    if not isinstance(entry, dict):
+        raise ValueError(f"{location}: expected an object with the keys {', '.join(CSV_COLUMNS)}")
+    values: Dict[str, Optional[str]] = dict()
+    for column in ("given_name", "family_name", "orcid", "email"):
+        value = entry.get(column)
+        if value is not None and not isinstance(value, str):
+            raise ValueError(f"{location}: {column} must be a string, not {type(value).__name__}")
+        values[column] = value.strip() if value is not None and value.strip() != "" else None
+    given_name, family_name = values["given_name"], values["family_name"]
+    if given_name is None or family_name is None:
+        raise ValueError(f"{location}: given_name and family_name are required")
+    affiliations = entry.get("affiliations") or list()
+    if isinstance(affiliations, str):
+        affiliations = affiliations.split(";")
+    if not isinstance(affiliations, list) or not all(isinstance(affiliation, str) for affiliation in affiliations):
+        raise ValueError(f"{location}: affiliations must be a string separated by ; or a list of strings")
+    affiliations = [affiliation.strip() for affiliation in affiliations if affiliation.strip() != ""]
+    return Author(given_name, family_name, values["orcid"], affiliations, values["email"])
+
+def export_file(registry: AuthorRegistry, path: str) -> int:
+    '''Function to save all authors as CSV or JSON file (see import_file()).'''
+    authors = registry.export_authors()
+    if path.endswith(".json"):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump([author._asdict() for author in authors], f, ensure_ascii=False, indent=2)
+    else:
+        import csv
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(CSV_COLUMNS)
+            for author in authors:
+                writer.writerow((author.given_name, author.family_name, author.orcid or "", "; ".join(author.affiliations), author.email or ""))
+    return len(authors)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Bulk import/export of the XML2YAML-OS author registry.")
+    parser.add_argument("command", choices=["import", "export", "stats"], help="import: add authors from a file || export: save all authors to a file || stats: print the number of authors")
+    parser.add_argument("db", type=str, help="Path of the registry database")
+    parser.add_argument("file", type=str, nargs="?", help="CSV or JSON file (import/export)")
+    args = parser.parse_args()
+    registry = AuthorRegistry(args.db)
+    if args.command == "stats":
+        print(json.dumps(registry.stats()))
+    elif args.file is None:
+        parser.error(f"{args.command} needs a file")
+    elif args.command == "import":
+        try:
+            print(f"{import_file(registry, args.file)} authors added or updated.")
+        except ValueError as e:
+            registry.close()
+            parser.error(f"Invalid import file: {e}")
+    else:
+        print(f"{export_file(registry, args.file)} authors exported to {args.file}.")
+    registry.close()
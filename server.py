@@ -0,0 +1,260 @@
+'''
+Long-running conversion server for XML2YAML-OS.
+
+Keeps the converter warm in a pool of worker processes and accepts conversion requests over HTTP (TCP or Unix
+socket), so callers do not pay interpreter start-up and imports for every article.
+
+Endpoints
+---------
+POST /convert?year=<YEAR>&volume=<VOLUME>&doi=<DOI>&orcid=<AUTHOR_LASTNAME>=<ORCID>[&orcid=...][&format=yaml|json|ndjson]
+    Request body: OJS XML. Response: the YAML metadata (one YAML document per article of the export), or with
+    format=json/ndjson the same metadata as JSON (ndjson: one line per article).
+GET /health
+    Liveness check.
+GET /metrics
+    Request, failure and timing counters as JSON.
+
+A request takes its slot (workers + queue) before the body is read; without a free slot it is rejected with 503
+right away. The body is streamed to a temporary file whose path is handed to the worker, so neither the server
+threads nor the workers hold the XML (incl. the embedded galleys) in memory.
+
+Usage: python server.py [--host HOST] [--port PORT] [--socket PATH] [--workers N] [--queue N]
+'''
+
+import argparse
+import json
+import logging
+import os
+import socketserver
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Union
+from urllib.parse import parse_qs, urlsplit
+
+# Maximum size of a request body in bytes (OJS exports with embedded galleys can be large; the body is spooled to disk)
+MAX_BODY_SIZE: int = 512 * 1024 * 1024
+# Size of the chunks in which the body is copied to the temporary file
+BODY_CHUNK_SIZE: int = 64 * 1024
+CONTENT_TYPES: Dict[str, str] = {"yaml": "application/yaml; charset=utf-8", "json": "application/json; charset=utf-8", "ndjson": "application/x-ndjson; charset=utf-8"}
+
+
+def warm_up() -> None:
+    '''Imports the converter in a worker process (and registers the YAML representers).'''
+    import xml2yaml  # noqa: F401
+
+def convert_xml(xml_path: str, year: Optional[str], volume: Optional[str], orcid: Optional[List[str]], doi: Optional[str], output_format: str = "yaml") -> List[str]:
+    '''Worker function converting an XML file (the spooled request body) to the YAML (or JSON) documents of its articles.'''
+    from xml2yaml import convert_publications
+    try:
+        return list(convert_publications(xml_path, year, volume, orcid, doi, output_format))
+    except Exception as e:
+        # lxml exceptions cannot be pickled back to the server process
+        raise ValueError(f"{type(e).__name__}: {e}") from None
+
+
+class ConversionService:
+    '''Bounded pool of warm worker processes plus the counters for /metrics.
+
+        Parameters
+        ----------
+        workers: int
+            Number of worker processes.
+        queue_size: int
+            Number of requests that may wait for a free worker; further requests are rejected with 503.
+    '''
+
+    def __init__(self, workers: int, queue_size: int) -> None:
+        self.workers = workers
+        self.executor = ProcessPoolExecutor(max_workers=workers)
+        # Limits conversions in progress + waiting conversions
+        self.slots = threading.BoundedSemaphore(workers + queue_size)
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.metrics: Dict[str, Union[int, float]] = {"requests": 0, "converted": 0, "failed": 0, "rejected": 0, "in_flight": 0, "seconds_total": 0.0}
+        for _ in range(workers):
+            self.executor.submit(warm_up)
+
+    def count(self, key: str, value: Union[int, float] = 1) -> None:
+        with self.lock:
+            self.metrics[key] += value
+
+    def acquire(self) -> bool:
+        '''Takes a slot for a request; returns False (and counts the rejection) if all slots are taken.'''
+        if not self.slots.acquire(blocking=False):
+            self.count("rejected")
+            return False
+        return True
+
+    def release(self) -> None:
+        self.slots.release()
+
+    def convert(self, xml_path: str, year: Optional[str], volume: Optional[str], orcid: Optional[List[str]], doi: Optional[str], output_format: str = "yaml") -> List[str]:
+        '''Converts the XML file xml_path in a worker process; the caller holds a slot (exceptions of the conversion are re-raised).'''
+        self.count("in_flight")
+        start = time.perf_counter()
+        try:
+            documents = self.executor.submit(convert_xml, xml_path, year, volume, orcid, doi, output_format).result()
+            self.count("converted")
+            return documents
+        except Exception:
+            self.count("failed")
+            raise
+        finally:
+            self.count("in_flight", -1)
+            self.count("seconds_total", time.perf_counter() - start)
+
+    def snapshot(self) -> Dict[str, Union[int, float]]:
+        with self.lock:
+            metrics = dict(self.metrics)
+        metrics["workers"] = self.workers
+        metrics["uptime_seconds"] = round(time.time() - self.started, 3)
+        metrics["seconds_total"] = round(metrics["seconds_total"], 6)
+        return metrics
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=True)
+
+
+class ConversionRequestHandler(BaseHTTPRequestHandler):
+    '''HTTP handler for /convert, /health and /metrics (the service is attached to the server).'''
+
+    server_version = "XML2YAML-OS"
+
+    def address_string(self) -> str:
+        # Unix socket connections have no client address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def send_body(self, status: int, body: str, content_type: str) -> None:
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_json(self, status: int, data: Dict) -> None:
+        self.send_body(status, json.dumps(data), "application/json")
+
+    def spool_body(self, length: int) -> Optional[str]:
+        '''Copies the request body in chunks to a temporary file and returns its path (None if the body is incomplete).'''
+        fd, xml_path = tempfile.mkstemp(prefix="xml2yaml-", suffix=".xml")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                remaining = length
+                while remaining > 0:
+                    chunk = self.rfile.read(min(remaining, BODY_CHUNK_SIZE))
+                    if not chunk:
+                        break
+                    f.write(chunk)
+                    remaining -= len(chunk)
+        except BaseException:
+            os.unlink(xml_path)
+            raise
+        if remaining > 0:
+            os.unlink(xml_path)
+            return None
+        return xml_path
+
+    def do_GET(self) -> None:
+        path = urlsplit(self.path).path
+        if path == "/health":
+            self.send_json(200, {"status": "ok"})
+        elif path == "/metrics":
+            self.send_json(200, self.server.service.snapshot())  # type: ignore[attr-defined]
+        else:
+            self.send_json(404, {"error": "NOT_FOUND"})
+
+    def do_POST(self) -> None:
+        service: ConversionService = self.server.service  # type: ignore[attr-defined]
+        url = urlsplit(self.path)
+        if url.path != "/convert":
+            self.send_json(404, {"error": "NOT_FOUND"})
+            return
+        service.count("requests")
+        # Requests rejected before their body has been read: the connection cannot be reused
+        self.close_connection = True
+        length = int(self.headers.get("Content-Length") or 0)
+        if length <= 0 or length > MAX_BODY_SIZE:
+            self.send_json(400 if length <= 0 else 413, {"error": "NO_XML_DATA" if length <= 0 else "XML_DATA_TOO_LARGE"})
+            return
+        params = parse_qs(url.query)
+        output_format = params["format"][0] if "format" in params else "yaml"
+        if output_format not in CONTENT_TYPES:
+            self.send_json(400, {"error": "UNKNOWN_FORMAT"})
+            return
+        year = params["year"][0] if "year" in params else None
+        volume = params["volume"][0] if "volume" in params else None
+        doi = params["doi"][0] if "doi" in params else None
+        orcid = params.get("orcid")
+        if not service.acquire():
+            self.send_json(503, {"error": "SERVER_BUSY"})
+            return
+        xml_path: Optional[str] = None
+        try:
+            xml_path = self.spool_body(length)
+            if xml_path is None:
+                self.send_json(400, {"error": "INCOMPLETE_XML_DATA"})
+                return
+            self.close_connection = False
+            documents = service.convert(xml_path, year, volume, orcid, doi, output_format)
+        except Exception as e:
+            self.send_json(422, {"error": str(e)})
+            return
+        finally:
+            service.release()
+            if xml_path is not None:
+                os.unlink(xml_path)
+        if len(documents) == 0:
+            self.send_json(422, {"error": "NO_PUBLICATION_DATA_FOUND"})
+        else:
+            self.send_body(200, "".join(documents), CONTENT_TYPES[output_format])
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    '''HTTP server listening on a Unix socket.'''
+
+    daemon_threads = True
+
+    def server_bind(self) -> None:
+        socketserver.UnixStreamServer.server_bind(self)
+        self.server_name = "localhost"
+        self.server_port = 0
+
+
+def create_server(service: ConversionService, host: str = "127.0.0.1", port: int = 8080, socket_path: Optional[str] = None) -> socketserver.BaseServer:
+    '''Function to create the HTTP server (on a Unix socket if socket_path is given).'''
+    server: socketserver.BaseServer
+    if socket_path is not None:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        server = ThreadingUnixHTTPServer(socket_path, ConversionRequestHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), ConversionRequestHandler)
+    server.service = service  # type: ignore[attr-defined]
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="XML2YAML-OS conversion server. Converts OJS XML sent via POST /convert to YAML.")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Host to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8080, help="Port to listen on (default: 8080)")
+    parser.add_argument("--socket", type=str, help="Listen on this Unix socket instead of host/port")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Number of worker processes (default: number of CPU cores)")
+    parser.add_argument("--queue", type=int, default=32, help="Number of requests that may wait for a worker before requests are rejected with 503 (default: 32)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    service = ConversionService(args.workers, args.queue)
+    server = create_server(service, args.host, args.port, args.socket)
+    logging.info(f"Listening on {args.socket or f'http://{args.host}:{args.port}'} with {args.workers} workers.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+        if args.socket is not None and os.path.exists(args.socket):
+            os.unlink(args.socket)
@@ -0,0 +1,204 @@
+'''
+Extraction of the submission files (manuscript DOCX/PDF, galleys, ...) embedded in OJS XML exports.
+
+With --extract-files <DIR> (or the environment variable XML2YAML_EXTRACT_FILES), the base64 payloads of the
+submission_file elements are decoded to <DIR>/<SUBMISSION_ID>/<FILE_NAME> while the export is stream-parsed for
+the metadata (see xml_stream.PublicationTarget), so no second parse is needed. Submission ids and file names are
+reduced to safe file names (see output.py), so no file is written outside of <DIR>. The payload text reaches the
+extractor in the chunks handed over by the parser and is decoded and written chunk by chunk; it is never held in
+memory as a whole. Every file is written atomically (see output.py). Once an article has been read, the folder of
+its files gets a manifest.json with name, size and SHA-256 checksum of every file.
+
+Both the OJS 3.2+ layout (submission_file > file > embed) and the OJS 3.1 layout (submission_file > revision >
+embed) are supported; submission files given as links (href) and other embedded files (e.g. issue covers) are
+skipped.
+'''
+
+import binascii
+import hashlib
+import json
+import logging
+import os
+from contextlib import ExitStack
+from typing import BinaryIO, Dict, List, Optional, Set, Union
+
+from output import atomic_open, safe_file_name, write_atomic
+
+MANIFEST_FILENAME: str = "manifest.json"
+
+PKP_NS: str = "{http://pkp.sfu.ca}"
+NAME_TAG: str = PKP_NS + "name"
+FILE_TAG: str = PKP_NS + "file"
+REVISION_TAG: str = PKP_NS + "revision"
+EMBED_TAG: str = PKP_NS + "embed"
+
+# Characters between the base64 characters of a payload (line breaks and indentation)
+_WHITESPACE = str.maketrans("", "", " \t\r\n")
+
+
+class SubmissionFileExtractor:
+    '''Decodes the embedded payloads of submission files to disk, fed with the parser events of xml_stream.
+
+        Parameters
+        ----------
+        output_dir: str
+            Folder for the extracted files (one subfolder per article).
+    '''
+
+    def __init__(self, output_dir: str) -> None:
+        self.output_dir = output_dir
+        # Manifest entries and used file names of the articles whose files are being extracted
+        self.manifests: Dict[str, List[Dict[str, Union[str, int, None]]]] = dict()
+        self.used_names: Dict[str, Set[str]] = dict()
+        # State of the current submission_file element
+        self.article: Optional[str] = None
+        self.attrib: Dict[str, str] = dict()
+        self.file_attrib: Dict[str, str] = dict()
+        self.name_parts: Optional[List[str]] = None
+        self.name: Optional[str] = None
+        # State of the current embed element (None if not in a base64 payload)
+        self.stack: Optional[ExitStack] = None
+        self.file: Optional[BinaryIO] = None
+        self.entry: Dict[str, Union[str, int, None]] = dict()
+        self.digest = hashlib.sha256()
+        self.rest: str = ""
+
+    def start_submission_file(self, attrib: dict, article: str) -> None:
+        '''Starts a submission_file element of the article with the key article (submission id or position).'''
+        self.article = article
+        self.attrib = dict(attrib)
+        self.file_attrib = dict()
+        self.name = None
+
+    def start(self, tag: str, attrib: dict) -> None:
+        '''Handles the start of an element inside the submission_file element.'''
+        if tag == NAME_TAG and self.name is None:
+            self.name_parts = list()
+        elif tag in (FILE_TAG, REVISION_TAG):
+            self.file_attrib = dict(attrib)
+        elif tag == EMBED_TAG and attrib.get("encoding", "base64") == "base64":
+            self._open(attrib)
+
+    def data(self, data: str) -> None:
+        if self.file is not None:
+            self._write(data)
+        elif self.name_parts is not None:
+            self.name_parts.append(data)
+
+    def end(self, tag: str) -> None:
+        if tag == NAME_TAG and self.name_parts is not None:
+            self.name = "".join(self.name_parts).strip() or None
+            self.name_parts = None
+        elif tag == EMBED_TAG and self.file is not None:
+            self._close()
+
+    def end_submission_file(self) -> None:
+        self.article = None
+
+    def end_article(self, article: str) -> None:
+        '''Writes the manifest of an article (if files have been extracted for it).'''
+        entries = self.manifests.pop(article, None)
+        self.used_names.pop(article, None)
+        if entries:
+            write_atomic(os.path.join(self._article_dir(article), MANIFEST_FILENAME), json.dumps({"files": entries}, ensure_ascii=False, indent=2))
+
+    def close(self) -> None:
+        '''Writes the manifests of the remaining articles.'''
+        for article in list(self.manifests):
+            self.end_article(article)
+
+    def abort(self) -> None:
+        '''Removes the temporary file of an unfinished payload (e.g. after a parser error).'''
+        if self.stack is not None:
+            stack, self.stack, self.file = self.stack, None, None
+            stack.__exit__(RuntimeError, RuntimeError("payload not finished"), None)
+
+    def _article_dir(self, article: str) -> str:
+        '''Returns the folder of the files of an article; raises ValueError if it is not inside the output folder.'''
+        path = os.path.join(self.output_dir, article)
+        root = os.path.realpath(self.output_dir)
+        resolved = os.path.realpath(path)
+        if resolved == root or os.path.commonpath([root, resolved]) != root:
+            raise ValueError(f"Invalid article key {article!r}: the folder of its files would be outside of {self.output_dir}")
+        return path
+
+    def _file_name(self, embed_attrib: dict, article: str) -> str:
+        '''Returns a file name for the payload that is unique within the folder of the article.'''
+        name = embed_attrib.get("filename") or self.file_attrib.get("filename") or self.attrib.get("filename") or self.name or ""
+        name = safe_file_name(name) or f"submission_file_{self.attrib.get('id') or self.file_attrib.get('id') or 'unknown'}"
+        extension = self.file_attrib.get("extension")
+        if extension and not name.lower().endswith("." + extension.lower()):
+            name += "." + safe_file_name(extension)
+        used = self.used_names.setdefault(article, set())
+        base, ext = os.path.splitext(name)
+        idx = 1
+        while name in used or name == MANIFEST_FILENAME:
+            idx += 1
+            name = f"{base}_{idx}{ext}"
+        used.add(name)
+        return name
+
+    def _open(self, embed_attrib: dict) -> None:
+        article = self.article if self.article is not None else "unknown"
+        article_dir = self._article_dir(article)
+        name = self._file_name(embed_attrib, article)
+        os.makedirs(article_dir, exist_ok=True)
+        self.stack = ExitStack()
+        self.file = self.stack.enter_context(atomic_open(os.path.join(article_dir, name), binary=True))
+        self.digest = hashlib.sha256()
+        self.rest = ""
+        self.entry = {
+            "file": f"{article}/{name}",
+            "name": self.name,
+            "submission_file_id": self.attrib.get("id"),
+            "file_id": self.file_attrib.get("id") or self.attrib.get("file_id"),
+            "stage": self.attrib.get("stage"),
+            "genre": self.attrib.get("genre") or self.file_attrib.get("genre"),
+        }
+
+    def _write(self, data: str) -> None:
+        # Decoding whole groups of 4 base64 characters; the rest is prepended to the next chunk
+        data = self.rest + data.translate(_WHITESPACE)
+        usable = len(data) - len(data) % 4
+        self.rest = data[usable:]
+        if usable > 0:
+            file = self.file
+            assert file is not None
+            decoded = binascii.a2b_base64(data[:usable])
+            self.digest.update(decoded)
+            file.write(decoded)
+
+    def _close(self) -> None:
+        if self.rest != "":
+            logging.warning(f"Base64 payload of {self.entry['file']} is truncated; the last {len(self.rest)} characters are ignored.")
+        file, stack = self.file, self.stack
+        assert file is not None and stack is not None
+        size = file.tell()
+        self.stack, self.file = None, None
+        stack.close()
+        expected = self.file_attrib.get("filesize")
+        if expected is not None and expected.isdigit() and int(expected) != size:
+            logging.warning(f"{self.entry['file']} has {size} bytes, the export states {expected} bytes.")
+        self.entry["size"] = size
+        self.entry["sha256"] = self.digest.hexdigest()
+        self.manifests.setdefault(self.article if self.article is not None else "unknown", list()).append(self.entry)
+
+
+# Folder for the extracted files of the conversions in this process (set by the CLI with --extract-files)
+_output_dir: Optional[str] = None
+
+def configure(output_dir: Optional[str]) -> None:
+    '''Function to set the folder for the extracted files of the conversions in this process (None: no extraction).'''
+    global _output_dir
+    _output_dir = output_dir
+
+def configured_dir() -> Optional[str]:
+    '''Returns the folder set with configure() (None if the files are not extracted).'''
+    return _output_dir
+
+def get_extractor() -> Optional[SubmissionFileExtractor]:
+    '''Returns an extractor for the folder set with configure() or None if no folder is set.'''
+    output_dir = _output_dir
+    if not output_dir:
+        return None
+    return SubmissionFileExtractor(output_dir)
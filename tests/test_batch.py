@@ -0,0 +1,55 @@
+'''
+Batch mode: files that fail (malformed XML, no publication) are reported in the summary and do not stop the
+conversion of the other files, with and without worker processes.
+
+Run with: python -m pytest tests
+'''
+
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch import NDJSON_FILENAME, SUMMARY_FILENAME, run_batch
+
+EXPORT = '<article xmlns="http://pkp.sfu.ca"><publication><title locale="en_US">{title}</title><authors><author><givenname>Wendy</givenname><familyname>Darling</familyname></author></authors></publication></article>'
+INPUTS = {
+    "a.xml": EXPORT.format(title="First"),
+    "b.xml": '<article xmlns="http://pkp.sfu.ca"><publication><title>Broken',
+    "c.xml": '<article xmlns="http://pkp.sfu.ca"><id type="internal">3</id></article>',
+    "d.xml": EXPORT.format(title="Second"),
+}
+
+
+def write_inputs(path) -> str:
+    path.mkdir()
+    for name, xml in INPUTS.items():
+        (path / name).write_text(xml, encoding="utf-8")
+    return str(path)
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_failing_files_do_not_stop_the_batch(tmp_path, jobs):
+    output_dir = tmp_path / "out"
+    output_dir.mkdir()
+    summary = run_batch(write_inputs(tmp_path / "in"), "2024", None, None, None, output_dir=str(output_dir), jobs=jobs)
+    assert (summary["total"], summary["converted"], summary["failed"]) == (4, 2, 2)
+    results = {os.path.basename(result["file"]): result for result in summary["files"]}
+    assert [name for name, result in results.items() if result["ok"]] == ["a.xml", "d.xml"]
+    assert results["b.xml"]["error"] is not None and results["b.xml"]["output"] == []
+    assert "NO_PUBLICATION_DATA_FOUND" in results["c.xml"]["error"]
+    assert sorted(os.listdir(output_dir)) == ["a.yaml", SUMMARY_FILENAME, "d.yaml"]
+    assert "First" in (output_dir / "a.yaml").read_text(encoding="utf-8")
+    with open(output_dir / SUMMARY_FILENAME, encoding="utf-8") as f:
+        assert json.load(f)["failed"] == 2
+
+def test_failing_files_are_left_out_of_the_ndjson_stream(tmp_path):
+    output_dir = tmp_path / "out"
+    output_dir.mkdir()
+    summary = run_batch(write_inputs(tmp_path / "in"), "2024", None, None, None, output_dir=str(output_dir), jobs=2, output_format="ndjson")
+    assert summary["failed"] == 2
+    with open(output_dir / NDJSON_FILENAME, encoding="utf-8") as f:
+        assert [json.loads(line)["title"] for line in f] == ["First", "Second"]
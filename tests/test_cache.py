@@ -0,0 +1,70 @@
+'''
+Conversion cache: a repeated conversion of the same file with the same values is served from the cache, other
+values or content miss it, the size limit evicts the least recently used entries, and conversions with an author
+registry bypass the cache.
+
+Run with: python -m pytest tests
+'''
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import registry
+from cache import ConversionCache
+from xml2yaml import convert_documents
+
+EXPORT = '<article xmlns="http://pkp.sfu.ca"><publication><title locale="en_US">{title}</title><authors><author><givenname>Wendy</givenname><familyname>Darling</familyname></author></authors></publication></article>'
+
+
+def write_export(path, title: str = "Title") -> str:
+    path.write_text(EXPORT.format(title=title), encoding="utf-8")
+    return str(path)
+
+def convert(xml_path: str, cache: ConversionCache, year: str = "2024") -> list:
+    return [document for document, _ in convert_documents(xml_path, year, None, None, None, cache)]
+
+
+def test_repeated_conversion_is_served_from_cache(tmp_path):
+    xml_path = write_export(tmp_path / "export.xml")
+    cache = ConversionCache(str(tmp_path / "cache"))
+    first = convert(xml_path, cache)
+    assert convert(xml_path, cache) == first
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert "title: 'Title'" in first[0]
+
+def test_other_values_or_content_miss_the_cache(tmp_path):
+    xml_path = write_export(tmp_path / "export.xml")
+    cache = ConversionCache(str(tmp_path / "cache"))
+    convert(xml_path, cache)
+    convert(xml_path, cache, year="2025")
+    write_export(tmp_path / "export.xml", "Changed")
+    assert "title: 'Changed'" in convert(xml_path, cache)[0]
+    assert (cache.hits, cache.misses) == (0, 3)
+    assert cache.stats()["entries"] == 3
+
+def test_evict_removes_least_recently_used_entries(tmp_path):
+    cache = ConversionCache(str(tmp_path / "cache"))
+    keys = [character * 64 for character in "abc"]
+    for age, key in enumerate(keys):
+        cache.put(key, ["x" * 1000])
+        # Oldest first: a, b, c
+        os.utime(cache._entry_path(key), (1000 + age, 1000 + age))
+    # Reading a marks it as recently used, so b is the least recently used entry
+    assert cache.get(keys[0]) is not None
+    cache.max_size = cache.stats()["size_bytes"] * 2 // 3
+    assert cache.evict() == 1
+    assert [key for key in keys if cache.get(key) is not None] == [keys[0], keys[2]]
+
+def test_registry_bypasses_the_cache(tmp_path):
+    xml_path = write_export(tmp_path / "export.xml")
+    cache = ConversionCache(str(tmp_path / "cache"))
+    registry.configure(str(tmp_path / "registry.db"))
+    try:
+        convert(xml_path, cache)
+        convert(xml_path, cache)
+    finally:
+        registry.configure(None)
+    assert (cache.hits, cache.misses) == (0, 0)
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,48 @@
+'''
+Output naming: name templates are validated before anything is converted, and the file names made from them stay
+inside the output folder.
+
+Run with: python -m pytest tests
+'''
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from output import check_name_template, format_name
+
+EXPORT = '<article xmlns="http://pkp.sfu.ca"><publication><title locale="en_US">Title</title><authors><author><givenname>Wendy</givenname><familyname>Darling</familyname></author></authors></publication></article>'
+
+
+@pytest.mark.parametrize("template", ["{doi}", "{submission_id}_{stem}", "article-{article}", "metadata", "{{doi}}"])
+def test_valid_name_templates(template):
+    check_name_template(template)
+
+@pytest.mark.parametrize("template", ["", "../{doi}", "{doi}/{article}", "{title}", "{0}", "{}", "{doi", "{doi.prefix}", "{article:03d}", "{doi!r}"])
+def test_invalid_name_templates_are_rejected(template):
+    with pytest.raises(ValueError):
+        check_name_template(template)
+
+@pytest.mark.parametrize("template, names, name", [
+    ("{doi}", {"doi": "10.33735/phimisci.2024.123"}, "10.33735_phimisci.2024.123"),
+    ("{submission_id}_{stem}", {"submission_id": "12"}, "12_export"),
+    ("{doi}", {"doi": None}, "export_2"),
+    ("{submission_id}", {"submission_id": "../.."}, "export_2"),
+    ("{stem}-{article}", {}, "export-2"),
+])
+def test_format_name(template, names, name):
+    assert format_name(template, "export", 2, names) == name
+
+def test_cli_rejects_invalid_template_before_converting(tmp_path):
+    xml_path = tmp_path / "export.xml"
+    xml_path.write_text(EXPORT, encoding="utf-8")
+    output_dir = tmp_path / "out"
+    process = subprocess.run([sys.executable, os.path.join(BASE_DIR, "xml2yaml.py"), str(xml_path), "--output", str(output_dir), "--name-template", "{title}"], capture_output=True, text=True, cwd=tmp_path)
+    assert process.returncode == 1
+    assert "unknown placeholder {title}" in process.stderr
+    assert not output_dir.exists()
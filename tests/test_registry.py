@@ -0,0 +1,38 @@
+'''
+Author registry: bulk import of CSV/JSON files.
+
+Run with: python -m pytest tests
+'''
+
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from registry import AuthorRegistry, import_file
+
+
+def import_json(tmp_path, entries) -> AuthorRegistry:
+    path = tmp_path / "authors.json"
+    path.write_text(json.dumps(entries), encoding="utf-8")
+    registry = AuthorRegistry(str(tmp_path / "authors.db"))
+    import_file(registry, str(path))
+    return registry
+
+
+def test_import_json(tmp_path):
+    registry = import_json(tmp_path, [{"given_name": " Wendy", "family_name": "Darling", "orcid": "https://orcid.org/0000-0002-5678-9012", "affiliations": ["Oxford "], "email": None}])
+    author = registry.lookup("wendy", "DARLING")
+    assert author is not None
+    assert (author.given_name, author.orcid, author.affiliations) == ("Wendy", "0000-0002-5678-9012", ["Oxford"])
+
+@pytest.mark.parametrize("entry", [{"given_name": None, "family_name": "Pan"}, {"family_name": "Pan"}, {"given_name": "Peter", "family_name": 7},
+                                   {"given_name": "Peter", "family_name": "Pan", "affiliations": [None]}, ["Peter", "Pan"]])
+def test_import_rejects_invalid_entries(tmp_path, entry):
+    with pytest.raises(ValueError, match="author 2"):
+        import_json(tmp_path, [{"given_name": "Wendy", "family_name": "Darling"}, entry])
+    # Nothing is added from an invalid file
+    assert AuthorRegistry(str(tmp_path / "authors.db")).stats()["authors"] == 0
@@ -0,0 +1,82 @@
+'''
+Conversion server: requests without a free slot are rejected with 503 before their body is read, invalid requests
+with 400 and failing conversions with 422; the server keeps converting afterwards.
+
+Run with: python -m pytest tests
+'''
+
+import http.client
+import json
+import os
+import socket
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server import ConversionService, create_server
+
+EXPORT = b'<article xmlns="http://pkp.sfu.ca"><publication><title locale="en_US">Title</title><authors><author><givenname>Wendy</givenname><familyname>Darling</familyname></author></authors></publication></article>'
+
+
+@pytest.fixture
+def server():
+    # One worker and no queue: a single slot, which the tests can take themselves
+    service = ConversionService(workers=1, queue_size=0)
+    http_server = create_server(service, port=0)
+    thread = threading.Thread(target=http_server.serve_forever, daemon=True)
+    thread.start()
+    yield service, http_server.server_address[1]
+    http_server.shutdown()
+    http_server.server_close()
+    service.shutdown()
+
+def post(port: int, body: bytes, query: str = "") -> tuple:
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    try:
+        connection.request("POST", "/convert" + query, body=body)
+        response = connection.getresponse()
+        return response.status, response.read().decode("utf-8")
+    finally:
+        connection.close()
+
+
+def test_valid_export_is_converted(server):
+    _, port = server
+    status, body = post(port, EXPORT, "?year=2024&format=json")
+    assert status == 200
+    assert json.loads(body)["title"] == "Title"
+
+def test_request_without_free_slot_is_rejected(server):
+    service, port = server
+    assert service.acquire()
+    try:
+        assert post(port, EXPORT) == (503, json.dumps({"error": "SERVER_BUSY"}))
+    finally:
+        service.release()
+    assert service.snapshot()["rejected"] == 1
+    assert post(port, EXPORT)[0] == 200
+
+@pytest.mark.parametrize("body, query, error", [(b"", "", "NO_XML_DATA"), (EXPORT, "?format=xml", "UNKNOWN_FORMAT")])
+def test_invalid_request_is_rejected(server, body, query, error):
+    _, port = server
+    assert post(port, body, query) == (400, json.dumps({"error": error}))
+
+def test_incomplete_body_is_rejected(server):
+    _, port = server
+    with socket.create_connection(("127.0.0.1", port), timeout=30) as connection:
+        connection.sendall(b"POST /convert HTTP/1.1\r\nHost: localhost\r\nContent-Length: 1000\r\n\r\n" + EXPORT)
+        connection.shutdown(socket.SHUT_WR)
+        response = connection.makefile("rb").read().decode("utf-8")
+    assert response.startswith("HTTP/1.0 400") or response.startswith("HTTP/1.1 400")
+    assert "INCOMPLETE_XML_DATA" in response
+
+@pytest.mark.parametrize("body, error", [(b'<article xmlns="http://pkp.sfu.ca"><publication>', "XMLSyntaxError"), (b'<article xmlns="http://pkp.sfu.ca"/>', "NO_PUBLICATION_DATA_FOUND")])
+def test_failing_conversion_is_rejected(server, body, error):
+    _, port = server
+    status, response = post(port, body)
+    assert status == 422
+    assert error in json.loads(response)["error"]
+    assert post(port, EXPORT)[0] == 200
@@ -0,0 +1,73 @@
+'''
+Extraction of the embedded submission files: the folders named after the submission ids of the export have to
+stay inside the output folder.
+
+Run with: python -m pytest tests
+'''
+
+import base64
+import io
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from submission_files import MANIFEST_FILENAME, SubmissionFileExtractor
+from xml_stream import iter_publications
+
+PAYLOAD = b"%PDF-1.4 manuscript"
+
+
+def make_export(submission_id: str, file_name: str = "manuscript.pdf") -> bytes:
+    '''Returns an OJS 3.2+ export of one article with the internal id submission_id and an embedded file.'''
+    return f'''<?xml version="1.0" encoding="utf-8"?>
+<articles xmlns="http://pkp.sfu.ca">
+  <article>
+    <id type="internal" advice="ignore">{submission_id}</id>
+    <submission_file id="5" file_id="6" stage="submission" genre="Article Text">
+      <name locale="en_US">{file_name}</name>
+      <file id="6" filesize="{len(PAYLOAD)}" extension="pdf">
+        <embed encoding="base64">{base64.b64encode(PAYLOAD).decode("ascii")}</embed>
+      </file>
+    </submission_file>
+    <publication><title locale="en_US">Title</title></publication>
+  </article>
+</articles>
+'''.encode("utf-8")
+
+def extract(export: bytes, output_dir: str) -> None:
+    extractor = SubmissionFileExtractor(output_dir)
+    assert len(list(iter_publications(io.BytesIO(export), extractor))) == 1
+
+def files_below(path: str) -> list:
+    return sorted(os.path.relpath(os.path.join(root, name), path) for root, _, names in os.walk(path) for name in names)
+
+
+@pytest.mark.parametrize("submission_id, folder", [("12", "12"), ("../../escaped", "escaped"), ("/tmp/escaped", "tmp_escaped"), ("..", "1")])
+def test_submission_id_stays_inside_output_folder(tmp_path, submission_id, folder):
+    output_dir = tmp_path / "out" / "files"
+    output_dir.mkdir(parents=True)
+    extract(make_export(submission_id), str(output_dir))
+    assert files_below(str(tmp_path)) == [os.path.join("out", "files", folder, name) for name in (MANIFEST_FILENAME, "manuscript.pdf")]
+    assert (output_dir / folder / "manuscript.pdf").read_bytes() == PAYLOAD
+    with open(output_dir / folder / MANIFEST_FILENAME, encoding="utf-8") as f:
+        assert json.load(f)["files"][0]["file"] == f"{folder}/manuscript.pdf"
+
+def test_file_name_stays_inside_article_folder(tmp_path):
+    extract(make_export("12", "../../../escaped.pdf"), str(tmp_path))
+    assert files_below(str(tmp_path)) == [os.path.join("12", "escaped.pdf"), os.path.join("12", MANIFEST_FILENAME)]
+
+@pytest.mark.parametrize("article", ["../escaped", "..", ".", "link"])
+def test_extractor_rejects_folders_outside_output_folder(tmp_path, article):
+    output_dir = tmp_path / "files"
+    output_dir.mkdir()
+    # A symlink in the output folder must not lead the files out of it either
+    (output_dir / "link").symlink_to(tmp_path)
+    extractor = SubmissionFileExtractor(str(output_dir))
+    extractor.start_submission_file({"id": "5"}, article)
+    with pytest.raises(ValueError):
+        extractor.start("{http://pkp.sfu.ca}embed", {"encoding": "base64", "filename": "manuscript.pdf"})
+    assert files_below(str(tmp_path)) == []
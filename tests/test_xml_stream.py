@@ -0,0 +1,50 @@
+'''
+Streaming parser of the OJS exports: documents with a DTD (entity expansion, external entities) are rejected before
+any entity is read.
+
+Run with: python -m pytest tests
+'''
+
+import io
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api
+from errors import InvalidXMLError
+from xml_stream import iter_publications
+
+PUBLICATION = '<article xmlns="http://pkp.sfu.ca"><publication><title locale="en_US">{title}</title><authors><author><givenname>Wendy</givenname><familyname>Darling</familyname></author></authors></publication></article>'
+# Ten entities, each referencing the previous one ten times: 10^9 copies of "lol" if expanded
+ENTITIES = '<!ENTITY lol0 "lol">' + "".join(f'<!ENTITY lol{i} "{f"&lol{i - 1};" * 10}">' for i in range(1, 10))
+
+
+def make_export(doctype: str, title: str) -> bytes:
+    return f'<?xml version="1.0" encoding="utf-8"?>\n{doctype}{PUBLICATION.format(title=title)}'.encode("utf-8")
+
+
+def test_export_without_dtd_is_parsed():
+    publications = list(iter_publications(io.BytesIO(make_export("", "Title"))))
+    assert [publication.findtext("{http://pkp.sfu.ca}title") for publication in publications] == ["Title"]
+
+def test_entity_expansion_is_rejected():
+    start = time.monotonic()
+    with pytest.raises(InvalidXMLError):
+        list(iter_publications(io.BytesIO(make_export(f"<!DOCTYPE article [{ENTITIES}]>", "&lol9;"))))
+    assert time.monotonic() - start < 1
+
+def test_external_entity_is_not_read(tmp_path):
+    secret = tmp_path / "secret.txt"
+    secret.write_text("SECRET")
+    export = make_export(f'<!DOCTYPE article [<!ENTITY secret SYSTEM "{secret.as_uri()}">]>', "Title &secret;")
+    with pytest.raises(InvalidXMLError) as excinfo:
+        api.convert(export, api.ConversionOptions(output_format="yaml"))
+    assert "SECRET" not in str(excinfo.value)
+
+def test_external_dtd_is_rejected():
+    with pytest.raises(InvalidXMLError):
+        list(iter_publications(io.BytesIO(make_export('<!DOCTYPE article SYSTEM "http://example.org/ojs.dtd">', "Title"))))
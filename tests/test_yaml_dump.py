@@ -0,0 +1,129 @@
+'''
+Parity of the YAML emission: xml2yaml.dump_yaml() (libyaml's CDumper where select_dumper() allows it) has to give
+the same bytes as the pure-Python Dumper for the metadata records of create_metadata().
+
+Run with: python -m pytest tests
+'''
+
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from records import Affiliation, Article, Author
+from xml2yaml import dump_yaml
+from yaml_setup import Dumper, LiteralString, PlainInt, PlainList, PlainString, SingleQuotedString, select_dumper, yaml
+
+TRICKY_STRINGS = [
+    "Line\u2028separator",
+    "Paragraph\u2029separator",
+    "Next\x85line",
+    " leading space",
+    "trailing space ",
+    "key: value",
+    "ends with colon:",
+    "- dash",
+    "# hash",
+    "'single' and \"double\" quotes",
+    "Emoji \U0001F600 outside the BMP",
+    "\U0001D510\U0001D51E letters",
+    "Tab\tseparated",
+    "Line\nbreak",
+    "Byte order mark \ufeff",
+    "null",
+    "true",
+    "2024",
+    "",
+]
+PIECES = ["Peter", "Pan", "Neverland", "Wörter", "Ægir", "Ελληνικά", "日本語", "😀", " ", "  ", ": ", ":", "?", "-", "- ",
+          "#", " #", "'", "''", "\"", "\\", "*", "**", "&", "!", "|", ">", "%", "@", "`", ",", "[", "]", "{", "}",
+          "\t", "\n", "\n\n", "\r", "\x85", "\u2028", "\ufeff", "\xa0", "\x07", "null", "true", "~", "1", "0.5",
+          "2024", "0000-0002-5678-9012", "10.33735/phimisci.2024.123", "...", "---", "long " * 30]
+# Pieces of typical metadata (documents made of these are emitted by libyaml)
+CLEAN_PIECES = [piece for piece in PIECES if select_dumper(piece) is not yaml.Dumper and piece.strip() != ""] + [" ", "  "]
+CLEAN_STRINGS = ["Peter Pan", "Wörter, Ægir und café", "Ελληνικά 日本語", "10.33735/phimisci.2024.123", "*7*", "A [bracket] {brace}"]
+
+
+def dump_reference(article: Article) -> str:
+    '''yaml.dump() with the pure-Python Dumper.'''
+    return yaml.dump(article, Dumper=yaml.Dumper, allow_unicode=True, default_flow_style=False, explicit_start=True, explicit_end=True, default_style="")
+
+def random_text(rng: random.Random, max_pieces: int = 12) -> str:
+    '''Creates random text, mostly made of typical metadata pieces.'''
+    if rng.random() < 0.9:
+        return "".join(rng.choice(CLEAN_PIECES) for _ in range(rng.randint(0, max_pieces))).strip(" ")
+    return "".join(rng.choice(PIECES) for _ in range(rng.randint(0, max_pieces)))
+
+def random_article(rng: random.Random) -> Article:
+    '''Returns an article record with the shape of create_metadata() output and random values.'''
+    article = Article()
+    article.title = SingleQuotedString(random_text(rng))
+    article.subtitle = rng.choice(["", SingleQuotedString(random_text(rng))])
+    for _ in range(rng.randint(0, 5)):
+        author = Author()
+        author.name = random_text(rng, 4)
+        author.affiliation = [Affiliation(random_text(rng, 6)) for _ in range(rng.randint(0, 3))]
+        author.email = random_text(rng, 3)
+        author.orcid = rng.choice([None, random_text(rng, 2)])
+        article.author.append(author)
+    article.keywords = sorted(random_text(rng, 3) for _ in range(rng.randint(0, 6)))
+    article.abstract = LiteralString(random_text(rng, 60))
+    article.author_short = rng.choice([None, SingleQuotedString(random_text(rng, 6))])
+    article.date = rng.choice([None, SingleQuotedString("2024")])
+    article.volume = rng.choice(["*7*", "NO_VOL_NUMBER_FOUND", random_text(rng, 2)])
+    article.doi = rng.choice(["NO_DOI_FOUND", SingleQuotedString(random_text(rng, 3))])
+    article["extra"] = rng.choice([PlainString(random_text(rng, 3)), PlainInt(str(rng.randint(0, 99))), PlainList([random_text(rng, 2) for _ in range(3)])])
+    return article
+
+def make_article(text: str) -> Article:
+    '''Returns an article record with text in every string field (as create_metadata() builds it).'''
+    article = Article()
+    article.title = SingleQuotedString(text)
+    article.subtitle = SingleQuotedString(text)
+    author = Author()
+    author.name = text
+    author.affiliation = [Affiliation(text), Affiliation("University of Oxford")]
+    author.email = text
+    author.orcid = text
+    article.author = [author, Author()]
+    article.keywords = [text, "Memory"]
+    article.abstract = LiteralString(text)
+    article.author_short = SingleQuotedString(text)
+    article.date = SingleQuotedString("2024")
+    article.volume = "*7*"
+    article.doi = SingleQuotedString(text)
+    article["pages"] = text
+    return article
+
+
+@pytest.mark.parametrize("text", TRICKY_STRINGS + CLEAN_STRINGS)
+def test_records_match_python_dumper(text):
+    article = make_article(text)
+    assert dump_yaml(article) == dump_reference(article)
+
+@pytest.mark.parametrize("text", [text for text in TRICKY_STRINGS if text not in ("null", "true", "2024", "", "key: value", "ends with colon:", "- dash", "# hash", "'single' and \"double\" quotes", "Line\nbreak")])
+def test_tricky_strings_use_python_dumper(text):
+    assert select_dumper(make_article(text)) is yaml.Dumper
+
+@pytest.mark.skipif(Dumper is yaml.Dumper, reason="PyYAML without libyaml")
+@pytest.mark.parametrize("text", CLEAN_STRINGS + ["key: value", "- dash", "# hash", "null", "2024", ""])
+def test_libyaml_emits_clean_records_like_python_dumper(text):
+    article = make_article(text)
+    assert select_dumper(article) is Dumper
+    options = dict(allow_unicode=True, default_flow_style=False, explicit_start=True, explicit_end=True, default_style="")
+    assert yaml.dump(article, Dumper=Dumper, **options) == yaml.dump(article, Dumper=yaml.Dumper, **options)
+
+def test_random_records_match_python_dumper():
+    rng = random.Random(42)
+    articles = [random_article(rng) for _ in range(2000)]
+    assert [article for article in articles if dump_yaml(article) != dump_reference(article)] == []
+
+def test_records_round_trip():
+    rng = random.Random(0)
+    article = make_article("".join(rng.choice(CLEAN_STRINGS) for _ in range(5)))
+    loaded = yaml.safe_load(dump_yaml(article))
+    assert list(loaded) == article.keys()
+    assert loaded["author"][0]["affiliation"] == [{"organization": article.author[0].affiliation[0].organization}, {"organization": "University of Oxford"}]
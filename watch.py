@@ -0,0 +1,300 @@
+'''
+Watch mode: converts OJS XML files as they land in a folder (e.g. the mounted xml_input/ folder of the container).
+
+New and changed *.xml files directly in the folder are converted to <OUTPUT_DIR>/<FILE_STEM>.yaml (.json/.ndjson
+for the other output formats) by a pool of warm worker processes, so hundreds of files arriving at once are
+converted in parallel. Changes are detected with inotify on Linux; on other systems, or with --watch-poll (e.g. for
+volumes mounted from macOS/Windows hosts, whose changes do not reach inotify), the folder is polled. A file is only
+converted once its size and modification time have not changed for the debounce time, so half-written files are
+not picked up. Files whose output is missing or older than the file are converted on start-up (all files if the
+output is named with --name-template, whose names are only known after the conversion); removed files are ignored
+(their output is kept).
+'''
+
+import logging
+import os
+import select
+import signal
+import struct
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from cache import ConversionCache
+    from xml2yaml import ProcessSettings
+
+# Seconds a file has to stay unchanged before it is converted
+DEBOUNCE_SECONDS: float = 1.0
+# Seconds between two scans of the folder if polling is used
+POLL_INTERVAL: float = 1.0
+# The cache is trimmed to its size limit and the hit/miss counts are saved after this many conversions or seconds
+CACHE_MAINTENANCE_CONVERSIONS: int = 100
+CACHE_MAINTENANCE_SECONDS: float = 300.0
+
+# inotify constants (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_EVENT_HEADER = struct.Struct("iIII")
+
+# (st_mtime_ns, st_size) of a file
+Signature = Tuple[int, int]
+
+
+def is_xml_file(name: str) -> bool:
+    return name.lower().endswith(".xml") and not name.startswith(".")
+
+def file_signature(path: str) -> Optional[Signature]:
+    '''Returns the modification time and size of path (None if it does not exist anymore).'''
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+def scan_folder(path: str) -> Dict[str, Signature]:
+    '''Returns the signatures of all XML files directly in path.'''
+    signatures: Dict[str, Signature] = dict()
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if is_xml_file(entry.name) and entry.is_file():
+                stat = entry.stat()
+                signatures[entry.path] = (stat.st_mtime_ns, stat.st_size)
+    return signatures
+
+
+class InotifyWatcher:
+    '''Reports the XML files of a folder that have been written, created or moved into it (Linux only).
+
+        Parameters
+        ----------
+        path: str
+            The folder to watch.
+    '''
+
+    def __init__(self, path: str) -> None:
+        import ctypes
+        import ctypes.util
+        self.path = path
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify is not available")
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(path), IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch failed for {path}")
+
+    def changed_files(self, timeout: Optional[float]) -> List[str]:
+        '''Waits up to timeout seconds (None: forever) and returns the paths of the changed XML files.'''
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return list()
+        names = set()
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                _, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b"\0").decode("utf-8", "surrogateescape")
+                offset += length
+                if mask & IN_Q_OVERFLOW:
+                    # Events have been lost: every file may have changed
+                    return list(scan_folder(self.path))
+                if is_xml_file(name):
+                    names.add(name)
+        return [os.path.join(self.path, name) for name in sorted(names)]
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    '''Reports the XML files of a folder whose size or modification time changed since the last scan.
+
+        Parameters
+        ----------
+        path: str
+            The folder to watch.
+        interval: float (default: POLL_INTERVAL)
+            Seconds between two scans.
+    '''
+
+    def __init__(self, path: str, interval: float = POLL_INTERVAL) -> None:
+        self.path = path
+        self.interval = interval
+        self.signatures = scan_folder(path)
+        self.next_scan = time.monotonic() + interval
+
+    def changed_files(self, timeout: Optional[float]) -> List[str]:
+        '''Waits up to timeout seconds (None: until the next scan) and returns the paths of the changed XML files.'''
+        wait = self.next_scan - time.monotonic()
+        if timeout is not None and timeout < wait:
+            time.sleep(max(timeout, 0))
+            return list()
+        time.sleep(max(wait, 0))
+        self.next_scan = time.monotonic() + self.interval
+        signatures = scan_folder(self.path)
+        changed = [path for path, signature in signatures.items() if self.signatures.get(path) != signature]
+        self.signatures = signatures
+        return changed
+
+    def close(self) -> None:
+        pass
+
+
+def create_watcher(path: str, poll_interval: Optional[float] = None):
+    '''Returns an InotifyWatcher for path or, if inotify is not available or poll_interval is set, a PollingWatcher.'''
+    if poll_interval is None:
+        try:
+            return InotifyWatcher(path)
+        except (OSError, AttributeError) as e:
+            logging.warning(f"inotify not available ({e}), polling {path} instead.")
+    return PollingWatcher(path, poll_interval if poll_interval is not None else POLL_INTERVAL)
+
+def needs_conversion(xml_filepath: str, output_path: str) -> bool:
+    '''Returns True if the output of xml_filepath is missing or older than the file.'''
+    output_base, output_ext = os.path.splitext(output_path)
+    # Exports with several articles are saved as <FILE_STEM>_<N>.yaml
+    for path in (output_path, f"{output_base}_1{output_ext}"):
+        try:
+            return os.path.getmtime(path) < os.path.getmtime(xml_filepath)
+        except FileNotFoundError:
+            continue
+    return True
+
+def _init_worker(settings: "ProcessSettings") -> None:
+    '''Applies the settings of the conversions and leaves Ctrl+C and SIGTERM to the watching process, which shuts the workers down.'''
+    from xml2yaml import configure_process
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    configure_process(settings)
+
+def run_watch(path: str, year: Optional[str], volume: Optional[str], orcid: Optional[List[str]], doi: Optional[str], output_dir: str = "yaml_output", jobs: Optional[int] = None, cache: Optional["ConversionCache"] = None, output_format: str = "yaml", debounce: float = DEBOUNCE_SECONDS, poll_interval: Optional[float] = None, name_template: Optional[str] = None, lock: bool = False, settings: Optional["ProcessSettings"] = None) -> None:
+    '''Function to convert the XML files of a folder as they arrive (runs until interrupted with Ctrl+C or SIGTERM).
+
+        Parameters
+        ----------
+        path: str
+            The folder to watch.
+        year, volume, orcid, doi
+            CLI values applied to every file (see xml2yaml.main()).
+        output_dir: str (default: "yaml_output")
+            Folder for the converted files (<FILE_STEM>.yaml).
+        jobs: Optional[int]
+            Number of worker processes (default: number of CPU cores).
+        cache: Optional[ConversionCache]
+            Conversion cache for unchanged files.
+        output_format: str (default: "yaml")
+            "yaml", "json" or "ndjson" (see xml2yaml.OUTPUT_FORMATS).
+        debounce: float (default: DEBOUNCE_SECONDS)
+            Seconds a file has to stay unchanged before it is converted.
+        poll_interval: Optional[float]
+            Poll the folder every poll_interval seconds instead of using inotify.
+        name_template: Optional[str]
+            Name the YAML/JSON file of every article after this template (see output.py).
+        lock: bool (default: False)
+            Hold an exclusive flock on <FILE>.lock while writing each output file.
+        settings: Optional[ProcessSettings]
+            Fields, profiling, registry and file extraction of the worker processes (see xml2yaml.ProcessSettings).
+    '''
+    from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+    from batch import convert_one
+    from xml2yaml import OUTPUT_EXTENSIONS, ProcessSettings
+
+    path = os.path.normpath(path)
+
+    def output_path_of(xml_filepath: str) -> str:
+        return os.path.join(output_dir, os.path.splitext(os.path.basename(xml_filepath))[0] + OUTPUT_EXTENSIONS[output_format])
+
+    # In a container the process runs as PID 1, which ignores SIGTERM without a handler
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+    signal.signal(signal.SIGTERM, stop)
+
+    watcher = create_watcher(path, poll_interval)
+    # Files waiting for the debounce time: path -> (time of the last change, signature at that time)
+    pending: Dict[str, Tuple[float, Optional[Signature]]] = dict()
+    # Signatures of the converted (or failed) versions, so unchanged files are not converted again
+    done: Dict[str, Signature] = dict()
+    running: Dict[Future, Tuple[str, Signature]] = dict()
+    # Cache hits and misses since the last cache maintenance
+    hits = misses = 0
+    maintained_at = time.monotonic()
+
+    def maintain_cache() -> None:
+        # A watcher runs for weeks: the cache is kept within its size limit and the stats are saved while it runs
+        nonlocal hits, misses, maintained_at
+        if cache is not None:
+            cache.update_stats(hits=hits, misses=misses)
+            cache.evict()
+        hits = misses = 0
+        maintained_at = time.monotonic()
+
+    now = time.monotonic()
+    for xml_filepath, signature in scan_folder(path).items():
+        if (name_template is not None and output_format != "ndjson") or needs_conversion(xml_filepath, output_path_of(xml_filepath)):
+            pending[xml_filepath] = (now, signature)
+        else:
+            done[xml_filepath] = signature
+    print(f"Watching {path} ({type(watcher).__name__}, {len(pending)} files to convert). Output: {output_dir}", flush=True)
+    executor = ProcessPoolExecutor(max_workers=max(1, jobs or os.cpu_count() or 1), initializer=_init_worker, initargs=(settings or ProcessSettings(),))
+    try:
+        while True:
+            now = time.monotonic()
+            # Waiting for file events until the next pending file is due (or a conversion has finished)
+            timeout: Optional[float] = None
+            if pending:
+                timeout = max(0.0, min(changed_at for changed_at, _ in pending.values()) + debounce - now)
+            if running:
+                timeout = min(timeout, 0.05) if timeout is not None else 0.05
+            for xml_filepath in watcher.changed_files(timeout):
+                pending[xml_filepath] = (time.monotonic(), file_signature(xml_filepath))
+            # Submitting the files that have not changed for the debounce time
+            now = time.monotonic()
+            busy = {running_path for running_path, _ in running.values()}
+            for xml_filepath, (changed_at, pending_signature) in list(pending.items()):
+                if now - changed_at < debounce or xml_filepath in busy:
+                    continue
+                current = file_signature(xml_filepath)
+                if current is None or current == done.get(xml_filepath):
+                    del pending[xml_filepath]
+                elif current != pending_signature:
+                    # Still being written (or not readable yet when the change was seen)
+                    pending[xml_filepath] = (now, current)
+                else:
+                    del pending[xml_filepath]
+                    task = (xml_filepath, output_path_of(xml_filepath), year, volume, orcid, doi, cache, output_format, name_template, lock)
+                    running[executor.submit(convert_one, task)] = (xml_filepath, current)
+            # Reporting finished conversions
+            if running:
+                finished, _ = wait(list(running), timeout=0, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    xml_filepath, signature = running.pop(future)
+                    done[xml_filepath] = signature
+                    result = future.result()
+                    hits += int(bool(result["cached"]))
+                    misses += int(not result["cached"])
+                    if result["ok"]:
+                        print(f"Converted {xml_filepath} -> {', '.join(result['output'])} in {result['seconds']:.2f}s{' (cache)' if result['cached'] else ''}", flush=True)
+                    else:
+                        logging.error(f"Conversion of {xml_filepath} failed: {result['error']}")
+            conversions = hits + misses
+            if conversions >= CACHE_MAINTENANCE_CONVERSIONS or (conversions > 0 and time.monotonic() - maintained_at >= CACHE_MAINTENANCE_SECONDS):
+                maintain_cache()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+        executor.shutdown(wait=True, cancel_futures=True)
+        maintain_cache()
@@ -3,19 +3,29 @@ Main file to convert OJS XML to YAML for file creation with Typesetting-Containe
 Copyright (c) 2024 Thomas Jurczyk and Philosophy and the Mind Sciences.
 '''
 
-from yaml_setup import *
-from lxml import etree
-from xml.etree.ElementTree import Element
-import html
+from __future__ import annotations
 import argparse
 import os, re
-from functions import *
-import logging
-from typing import Optional, Tuple
 
-def parse_arguments() -> Tuple[Optional[str], Optional[str], Optional[int], Optional[List[str]], Optional[str]]:
+from typing import TYPE_CHECKING, NamedTuple
+
+# Start-up matters because the CLI is called thousands of times from shell pipelines: lxml, PyYAML and the
+# helper modules are only imported when a conversion actually happens (see benchmarks/bench_startup.py).
+if TYPE_CHECKING:
+    from lxml import etree
+    from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
+    from cache import ConversionCache
+    from records import Article
+    from registry import AuthorRegistry
+
+# Output formats and their file extensions: JSON has the same structure and values as the YAML (pandoc reads both
+# with --metadata-file), NDJSON writes one compact JSON object per article and line
+OUTPUT_EXTENSIONS = {"yaml": ".yaml", "json": ".json", "ndjson": ".ndjson"}
+OUTPUT_FORMATS = tuple(OUTPUT_EXTENSIONS)
+
+def parse_arguments() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description='XML2YAML-OS CLI program. Converts OJS XML to YAML.')
-    parser.add_argument('xml_file', type=str, help='Path to the input XML file')
+    parser.add_argument('xml_file', type=str, help='Path to the input XML file (or a directory/glob pattern to convert many files in batch mode, or - to read the XML from stdin)')
     # Additional year field might be necessary if the year is not present in the XML file
     parser.add_argument("-y", "--year", type=str, help="Year of publication")
     parser.add_argument("-v", "--volume", type=str, help="Volume number")
@@ -24,62 +34,344 @@ def parse_arguments() -> Tuple[Optional[str], Optional[str], Optional[int], Opti
     parser.add_argument("-o", "--orcid", type=str, nargs="+", help="ORCID key-value pairs of authors (separated via blank space when multiple authors): --orcid <AUTHOR_LASTNAME>=<ORCID> || --orcid Starke=0000-0001-1111-1111 Jurczyk=0000-0002-5943-2305")
     # Get DOI
     parser.add_argument("-d", "--doi", type=str, help="DOI of the article.")
-    # Parse arguments
-    args = parser.parse_args()
-    # The path to the XML file can be accessed using the args.xml_file attribute
-    xml_file_path = args.xml_file
-    return (xml_file_path, args.year, args.volume, args.orcid, args.doi)
+    # Number of worker processes in batch mode
+    parser.add_argument("-j", "--jobs", type=int, help="Number of parallel conversions in batch mode (default: number of CPU cores)")
+    # Conversion cache for incremental re-runs (inspect with: python cache.py stats <CACHE_DIR>)
+    parser.add_argument("--cache", type=str, default=os.environ.get("XML2YAML_CACHE"), help="Folder of the conversion cache; unchanged files are not converted again (default: $XML2YAML_CACHE, no cache if unset)")
+    parser.add_argument("--cache-size", type=int, help="Size limit of the conversion cache in MB (default: 512)")
+    # Additional (or overridden) metadata fields as XPath expressions (see fields.py)
+    parser.add_argument("--fields", type=str, default=os.environ.get("XML2YAML_FIELDS"), help="JSON file with additional metadata fields: {\"publication\": {<NAME>: {\"xpath\": <XPATH>}}, \"author\": {...}} (default: $XML2YAML_FIELDS)")
+    # Author registry for back-filling ORCIDs and affiliations (bulk import/export: python registry.py import|export <DB> <FILE>)
+    parser.add_argument("--registry", type=str, default=os.environ.get("XML2YAML_REGISTRY"), help="SQLite author registry; converted authors are added, missing ORCIDs and affiliations are filled from it (default: $XML2YAML_REGISTRY)")
+    # Per-stage timing and memory spans as JSON lines (see profiling.py); the path is a separate option, so that --profile
+    # never takes the xml_file argument as its value
+    parser.add_argument("--profile", action="store_const", const="stderr", default=os.environ.get("XML2YAML_PROFILE"), help="Record timing and memory per conversion stage as JSON lines to stderr (default: $XML2YAML_PROFILE, stderr or a file)")
+    parser.add_argument("--profile-output", type=str, metavar="PATH", help="Append the profile to the file PATH instead of writing it to stderr (implies --profile)")
+    # Watch mode: converting the XML files of the folder xml_file as they arrive
+    parser.add_argument("--watch", action="store_true", help="Keep running and convert new or changed XML files in the folder xml_file (inotify, or polling with --watch-poll)")
+    parser.add_argument("--watch-poll", type=float, nargs="?", const=1.0, help="Poll the folder every WATCH_POLL seconds (default: 1) instead of using inotify, e.g. for volumes mounted from macOS/Windows hosts")
+    parser.add_argument("--debounce", type=float, default=1.0, help="Seconds a file has to stay unchanged before it is converted in watch mode (default: 1)")
+    # Output format: YAML, JSON (pandoc --metadata-file) or NDJSON (one compact JSON object per article and line)
+    parser.add_argument("--format", type=str, choices=OUTPUT_FORMATS, default="yaml", help="Output format: yaml, json (pandoc --metadata-file) or ndjson (one line per article; a single file for all articles in batch mode) (default: yaml)")
+    # Output file (- for stdout); default: yaml_output/metadata.yaml, stdout when reading from stdin
+    parser.add_argument("--output", type=str, help="Path of the YAML file, - for stdout, or the output folder in batch mode and with --name-template (default: yaml_output/metadata.yaml, stdout when reading from stdin)")
+    # Naming of the output files after the articles (see output.py), e.g. --name-template "{doi}"
+    parser.add_argument("--name-template", type=str, help="Name the YAML/JSON file of every article after a template with the placeholders {stem}, {doi}, {submission_id} and {article} (the extension is added; files are saved in the --output folder)")
+    # Files are always replaced atomically; the lock additionally serialises cooperating writers and readers
+    parser.add_argument("--lock", action="store_true", help="Hold an exclusive flock on <FILE>.lock while writing each output file")
+    # Embedded submission files (manuscript, galleys) decoded to disk in the same pass (see submission_files.py)
+    parser.add_argument("--extract-files", type=str, default=os.environ.get("XML2YAML_EXTRACT_FILES"), help="Decode the embedded submission files to EXTRACT_FILES/<SUBMISSION_ID>/ with a manifest.json of their SHA-256 checksums (default: $XML2YAML_EXTRACT_FILES)")
+    # Parse arguments (the path to the XML file can be accessed using the args.xml_file attribute)
+    return parser.parse_args()
 
-def main(xml_filepath: Optional[str], year: Optional[str], volume: Optional[str], orcid: Optional[List[str]], doi: Optional[str]) -> None:
+class ProcessSettings(NamedTuple):
+    '''Settings of the conversions in a whole process. The CLI applies them to its own process with
+    configure_process(), batch and watch mode to their worker processes (configure_process() is the pool initializer).'''
+    # JSON file with additional metadata fields (see fields.py)
+    fields_file: Optional[str] = None
+    # "stderr" or a file for the per-stage spans (see profiling.py) and whether the Python allocations are traced
+    profile: Optional[str] = None
+    profile_memory: bool = True
+    # SQLite author registry (see registry.py)
+    registry_db: Optional[str] = None
+    # Folder for the embedded submission files (see submission_files.py)
+    extract_files: Optional[str] = None
+
+def configure_process(settings: ProcessSettings) -> None:
+    '''Function to apply the settings to the conversions of the current process (see ProcessSettings).'''
+    if settings.fields_file is not None:
+        from fields import load_fields
+        load_fields(settings.fields_file)
+    if settings.profile is not None:
+        import profiling
+        profiling.enable(settings.profile, settings.profile_memory)
+    if settings.registry_db is not None:
+        import registry
+        registry.configure(settings.registry_db)
+    if settings.extract_files is not None:
+        import submission_files
+        submission_files.configure(settings.extract_files)
+
+def main(args: argparse.Namespace) -> None:
     '''Main program logic to convert XML2YAML.
 
         Parameters
         ----------
-            xml_filepath: Optional[str]
-                The path to the XML file (cannot be None actually because of required positional argument).
-            year: Optional[str]
-                Publishing year of the article (str or None).
-            volume: Optional[str]
-                Number of the volume in which the article appears (int or None).
-            orcid: Optional[str]
-                String with key-value pairs of <AUTHOR_LASTNAME> and <ORCID>. Example: --orcid Starke=0000-0001-1111-1111 Jurczyk=0000-0002-5943-2305 (this string needs to be parsed later on)
+            args: argparse.Namespace
+                The CLI arguments (see parse_arguments()): xml_file (- for stdin, a directory or glob pattern for batch
+                mode, the folder to watch with watch), the values year, volume, orcid (<AUTHOR_LASTNAME>=<ORCID>
+                pairs) and doi applied to every article, and the options jobs, cache, cache_size, fields, profile,
+                profile_output, registry, output, format, watch, watch_poll, debounce, name_template, lock and
+                extract_files.
     '''
-    assert xml_filepath is not None
-    # OJS XML file should be in the xml folder
-    if os.environ.get("IS_CONTAINER") == "true":
+    xml_filepath: str = args.xml_file
+    output: Optional[str] = args.output
+    output_format: str = args.format
+    name_template: Optional[str] = args.name_template
+    if name_template is not None:
+        from output import check_name_template
+        try:
+            check_name_template(name_template)
+        except ValueError as e:
+            import logging
+            logging.error(str(e))
+            exit(1)
+    # OJS XML file should be in the xml folder (unless it is read from stdin)
+    if os.environ.get("IS_CONTAINER") == "true" and xml_filepath != "-":
         xml_filepath = "xml_input/"+xml_filepath
-    else:
-        xml_filepath = xml_filepath
+    # Fields, profiling, registry and file extraction apply to this process and to the worker processes
+    settings = ProcessSettings(fields_file=args.fields, profile=args.profile_output or args.profile, profile_memory=os.environ.get("XML2YAML_PROFILE_MEMORY") != "0", registry_db=args.registry, extract_files=args.extract_files)
+    if settings.extract_files is not None:
+        os.makedirs(settings.extract_files, exist_ok=True)
+    configure_process(settings)
+    cache: Optional[ConversionCache] = None
+    if args.cache is not None:
+        from cache import ConversionCache
+        cache = ConversionCache(args.cache, args.cache_size)
+    # Watch mode: converting files as they land in the folder until interrupted
+    if args.watch:
+        if not os.path.isdir(xml_filepath):
+            print("ERROR_NO_FOLDER_FOUND")
+            exit(1)
+        from watch import run_watch
+        output_dir = output if output is not None else "yaml_output"
+        os.makedirs(output_dir, exist_ok=True)
+        run_watch(xml_filepath, args.year, args.volume, args.orcid, args.doi, output_dir=output_dir, jobs=args.jobs, cache=cache, output_format=output_format, debounce=args.debounce, poll_interval=args.watch_poll, name_template=name_template, lock=args.lock, settings=settings)
+        return
+    # Directory or glob pattern: converting every file to yaml_output/<FILE_STEM>.yaml
+    if xml_filepath != "-" and (os.path.isdir(xml_filepath) or any(c in xml_filepath for c in "*?[")):
+        from batch import run_batch, SUMMARY_FILENAME
+        output_dir = output if output is not None else "yaml_output"
+        os.makedirs(output_dir, exist_ok=True)
+        summary = run_batch(xml_filepath, args.year, args.volume, args.orcid, args.doi, output_dir=output_dir, jobs=args.jobs, cache=cache, output_format=output_format, name_template=name_template, lock=args.lock, settings=settings)
+        print(f"Converted {summary['converted']} of {summary['total']} files in {summary['seconds']:.2f}s ({summary['failed']} failed, {summary['cached']} from cache). Summary: {os.path.join(output_dir, SUMMARY_FILENAME)}")
+        if summary["failed"] > 0:
+            exit(1)
+        return
     # Check if file exists
-    if not os.path.isfile(xml_filepath):
+    if xml_filepath != "-" and not os.path.isfile(xml_filepath):
         print("ERROR_NO_FILE_FOUND")
         exit()
+    if name_template is not None and output != "-" and output_format != "ndjson":
+        # The output is the folder of the named files (convert_file() uses the folder of output)
+        output_dir = output if output is not None else "yaml_output"
+        os.makedirs(output_dir, exist_ok=True)
+        output = os.path.join(output_dir, "metadata" + OUTPUT_EXTENSIONS[output_format])
+    elif output is None:
+        output = "-" if xml_filepath == "-" else "yaml_output/metadata" + OUTPUT_EXTENSIONS[output_format]
+    elif output != "-" and os.path.dirname(output) != "":
+        os.makedirs(os.path.dirname(output), exist_ok=True)
 
-    ### Parse XML
-    xml_data = etree.parse(xml_filepath)
-    root = xml_data.getroot()
-    # Dropping submission files from XML
-    for child in root:
-        if child.tag == "{http://pkp.sfu.ca}submission_file":
-            root.remove(child)
-    # Find publication node
-    publication_data = root.find("{http://pkp.sfu.ca}publication")
+    ### Parse XML and save YAML metadata (one file per article for issue or multi-article exports)
+    # stdin is parsed while it arrives (no temporary file); the YAML documents are written to stdout one by one if output is -
+    import sys
+    xml_source: Union[str, BinaryIO] = sys.stdin.buffer if xml_filepath == "-" else xml_filepath
+    output_paths = convert_file(xml_source, output, args.year, args.volume, args.orcid, args.doi, cache, output_format, name_template, args.lock)
+    if cache is not None:
+        cache.update_stats()
+        cache.evict()
     # exiting if publication_data not found
-    if publication_data is None:
+    if len(output_paths) == 0:
+        import logging
         logging.error("NO_PUBLICATION_DATA_FOUND. EXIT.")
         exit()
-    # Initialize dictionary for yaml
-    data_dict = create_dict_4yaml()
+
+def convert_file(xml_filepath: Union[str, BinaryIO], output_path: str, year: Optional[str], volume: Optional[str], orcid: Optional[List[str]], doi: Optional[str], cache: Optional[ConversionCache] = None, output_format: str = "yaml", name_template: Optional[str] = None, lock: bool = False) -> List[str]:
+    '''Function to convert every article of an OJS XML export in a single streaming pass.
+
+        Parameters
+        ----------
+            xml_filepath: Union[str, BinaryIO]
+                The path to the XML file or a binary file object (e.g. stdin; never cached).
+            output_path: str
+                The path of the YAML file. If the export contains several articles, they are saved as
+                <output_path stem>_<N>.yaml (N = position of the article in the export, starting with 1).
+                With - the YAML documents are written to stdout (one YAML document per article).
+                NDJSON is always written to output_path (one line per article).
+            year, volume, orcid, doi
+                Values passed via CLI (see main()); they are applied to every article.
+            cache: Optional[ConversionCache]
+                If given, the YAML documents are taken from the cache (without parsing the XML) or saved in it.
+            output_format: str (default: "yaml")
+                "yaml", "json" or "ndjson" (see OUTPUT_FORMATS).
+            name_template: Optional[str]
+                If given, every article is saved as <name><extension> in the folder of output_path, with the name
+                created from the template (see output.format_name(); a name that is used twice within the export
+                gets the suffix _<N>). Not used for stdout and NDJSON.
+            lock: bool (default: False)
+                Hold an exclusive flock on <FILE>.lock while writing each file (see output.py).
+
+        Returns
+        -------
+            List[str]
+                The paths of the saved YAML files (empty if no publication data has been found; - for every
+                document written to stdout).
+    '''
+    from output import atomic_open, format_name
+    from profiling import span
+    output_paths: List[str] = list()
+    with span("convert", file=xml_filepath if isinstance(xml_filepath, str) else "-"):
+        documents = convert_documents(xml_filepath, year, volume, orcid, doi, cache, output_format)
+        if output_path == "-":
+            for document, _ in documents:
+                with span("write", article=len(output_paths)+1):
+                    save_yaml(document, output_path)
+                output_paths.append(output_path)
+            return output_paths
+        if output_format == "ndjson":
+            # One line per article in a temporary file that replaces output_path once the export is converted
+            first_document = next(documents, None)
+            if first_document is None:
+                return output_paths
+            with atomic_open(output_path, lock) as f:
+                f.write(first_document[0])
+                for idx, (document, _) in enumerate(documents, 2):
+                    with span("write", article=idx):
+                        f.write(document)
+            return [output_path]
+        stem = os.path.splitext(os.path.basename(xml_filepath))[0] if isinstance(xml_filepath, str) else "stdin"
+        output_base, output_ext = os.path.splitext(output_path)
+        used_names = set()
+
+        def save_article(document: str, names: Dict[str, Optional[str]], idx: int, single: bool) -> None:
+            if name_template is not None:
+                name = format_name(name_template, stem, idx, names)
+                if name in used_names:
+                    name = f"{name}_{idx}"
+                used_names.add(name)
+                article_output_path = os.path.join(os.path.dirname(output_path), name + output_ext)
+            else:
+                # Single article: keeping the plain output path
+                article_output_path = output_path if single else f"{output_base}_{idx}{output_ext}"
+            with span("write", article=idx):
+                save_yaml(document, article_output_path, lock)
+            output_paths.append(article_output_path)
+
+        # The first document is held back until it is known whether the export contains further articles
+        held: Optional[Tuple[str, Dict[str, Optional[str]]]] = None
+        for idx, (document, names) in enumerate(documents, 1):
+            if idx == 1:
+                held = (document, names)
+                continue
+            if held is not None:
+                save_article(held[0], held[1], 1, False)
+                held = None
+            save_article(document, names, idx, False)
+        if held is not None:
+            save_article(held[0], held[1], 1, True)
+    return output_paths
+
+def convert_documents(xml_filepath: Union[str, BinaryIO], year: Optional[str], volume: Optional[str], orcid: Optional[List[str]], doi: Optional[str], cache: Optional[ConversionCache] = None, output_format: str = "yaml") -> Iterator[Tuple[str, Dict[str, Optional[str]]]]:
+    '''Generator yielding the document and the names (see convert_articles()) of every article, from the cache if possible (see convert_file()).'''
+    from profiling import span
+    cache_key: Optional[str] = None
+    cached_entry: Optional[Dict[str, list]] = None
+    # The XML is parsed anyway if the submission files are extracted (see submission_files.py), and every conversion
+    # has to add its authors to the author registry (a cache hit would leave the registry without them)
+    import registry, submission_files
+    if cache is not None and isinstance(xml_filepath, str) and submission_files.configured_dir() is None and registry.configured_path() is None:
+        with span("cache.get"):
+            cache_key = cache.make_key(xml_filepath, year, volume, orcid, doi, output_format)
+            cached_entry = cache.get(cache_key)
+    if cached_entry is not None:
+        yield from zip(cached_entry["documents"], cached_entry["names"])
+        return
+    converted_documents: List[str] = list()
+    converted_names: List[Dict[str, Optional[str]]] = list()
+    for document, names in convert_articles(xml_filepath, year, volume, orcid, doi, output_format):
+        converted_documents.append(document)
+        converted_names.append(names)
+        yield document, names
+    if cache is not None and cache_key is not None and len(converted_documents) > 0:
+        with span("cache.put"):
+            cache.put(cache_key, converted_documents, converted_names)
+
+def convert_publications(xml_source: Union[str, BinaryIO], year: Optional[str], volume: Optional[str], orcid: Optional[List[str]], doi: Optional[str], output_format: str = "yaml") -> Iterator[str]:
+    '''Generator yielding the YAML (or JSON, see OUTPUT_FORMATS) document of every article of an OJS XML export (path or binary file object, see convert_file()).'''
+    for document, _ in convert_articles(xml_source, year, volume, orcid, doi, output_format):
+        yield document
+
+def convert_articles(xml_source: Union[str, BinaryIO], year: Optional[str], volume: Optional[str], orcid: Optional[List[str]], doi: Optional[str], output_format: str = "yaml") -> Iterator[Tuple[str, Dict[str, Optional[str]]]]:
+    '''Generator yielding the document of every article together with the values for the output name templates
+    (dict with the keys doi and submission_id, see output.py).'''
+    import logging, sqlite3
+    from profiling import span
+    from registry import get_registry
+    from submission_files import get_extractor
+    from xml_stream import iter_publications, submission_id
+    # Author registry for back-filling ORCIDs and affiliations (None if not set, see registry.py)
+    try:
+        registry = get_registry()
+    except sqlite3.Error as e:
+        logging.warning(f"The author registry could not be opened, converting without it: {e}")
+        registry = None
+    # Streaming the file: submission files (base64 payloads) are dropped while parsing, articles are converted one at a time
+    # Importing the converter modules up front, so that the first article's spans do not include the import time
+    with span("import"):
+        import fields, functions, yaml_setup  # noqa: F401
+    # Embedded submission files are decoded to disk while parsing if a folder is configured (None otherwise)
+    publications = iter_publications(xml_source, get_extractor())
+    idx = 0
+    while True:
+        # Parsing up to the end of the next article (incl. dropping its submission files)
+        with span("parse", article=idx+1):
+            publication_data = next(publications, None)
+        if publication_data is None:
+            break
+        if idx == 1 and doi is not None:
+            logging.warning("The DOI argument is applied to every article of the export. Please check the DOIs manually.")
+        with span("metadata", article=idx+1):
+            data_dict = create_metadata(publication_data, year, volume, orcid, doi, registry)
+        with span("dump", article=idx+1):
+            document = dump_document(data_dict, output_format)
+        idx += 1
+        yield document, {"doi": data_dict["doi"] if data_dict["doi"] != "NO_DOI_FOUND" else None, "submission_id": submission_id(publication_data)}
+
+def create_metadata(publication_data: etree._Element, year: Optional[str], volume: Optional[str], orcid: Optional[List[str]], doi: Optional[str], registry: Optional[AuthorRegistry] = None) -> Article:
+    '''Function to extract the YAML metadata from the publication node of an OJS XML export.
+
+        Parameters
+        ----------
+            publication_data: etree._Element
+                The publication node of the OJS XML.
+            year, volume, orcid, doi
+                Values passed via CLI (see main()); they overwrite the values in the XML.
+            registry: Optional[AuthorRegistry]
+                Author registry for back-filling ORCIDs and affiliations (see add_authors()).
+
+        Returns
+        -------
+            Article
+                The metadata record (see records.py; with the keys and dict interface of the former OrderedDict).
+
+        Raises
+        ------
+            InvalidPublicationError
+                If the publication has no authors node or an author without given or family name.
+    '''
+    import html, logging
+    from errors import InvalidPublicationError
+    from functions import create_keywords_4yaml, escape_html, parse_orcid
+    from fields import DEFAULT_PUBLICATION_FIELDS, PUBLICATION_FIELDS, extract_fields, field_text
+    from profiling import span
+    from records import Article
+    from yaml_setup import LiteralString, SingleQuotedString
+    # Initialize record for yaml (slotted, see records.py)
+    data_dict = Article()
+    # Evaluating the precompiled XPath of every field once (see fields.py)
+    with span("metadata.fields"):
+        fields = extract_fields(publication_data, PUBLICATION_FIELDS)
 
     ### Parse title
-    if publication_data.find("{http://pkp.sfu.ca}title") is not None:
+    title_element = fields.node("title")
+    if title_element is not None:
         # Parsing main title
-        title_element = publication_data.find("{http://pkp.sfu.ca}title")
         title: str = title_element.text if title_element.text else "NO_TITLE_FOUND"
-        title = escape_html(title)
+        with span("metadata.escape_html"):
+            title = escape_html(title)
         # Parsing subtitle
         subtitle: Optional[str] = None
-        subtitle_element = publication_data.find("{http://pkp.sfu.ca}subtitle")
+        subtitle_element = fields.node("subtitle")
         if subtitle_element is not None:
             subtitle = subtitle_element.text if subtitle_element.text else None
             if subtitle is not None:
@@ -114,18 +406,19 @@ def main(xml_filepath: Optional[str], year: Optional[str], volume: Optional[str]
         data_dict["title"] = SingleQuotedString("NO_TITLE_FIELD_FOUND_IN_XML")
 
     ### Parse abstract
-    if publication_data.find("{http://pkp.sfu.ca}abstract") is not None:
-        abstract_element = publication_data.find("{http://pkp.sfu.ca}abstract")
+    abstract_element = fields.node("abstract")
+    if abstract_element is not None:
         abstract: str = abstract_element.text if abstract_element.text else "NO_ABSTRACT_FOUND"
-        data_dict["abstract"] = escape_html(abstract)
+        with span("metadata.escape_html"):
+            data_dict["abstract"] = escape_html(abstract)
         data_dict["abstract"] = LiteralString(data_dict["abstract"])
     else:
         logging.warning("No abstract field found in XML. Replacing with NO_ABSTRACT_FIELD_FOUND_IN_XML.")
         data_dict["abstract"] = LiteralString("NO_ABSTRACT_FIELD_FOUND_IN_XML")
 
     ### Parse volume number (take XML volume if present and no arg given; arg volume always overwrites XML volume)
-    if (publication_data.find(".//{http://pkp.sfu.ca}volume") is not None) and (volume is None):
-        volume_element = publication_data.find(".//{http://pkp.sfu.ca}volume")
+    volume_element = fields.node("volume")
+    if (volume_element is not None) and (volume is None):
         volume_no: str = volume_element.text if volume_element.text else "NO_VOL_NUMBER"
         data_dict["volume"] = html.unescape(volume_no)
         data_dict["volume"] = "*"+data_dict["volume"]+"*"
@@ -138,8 +431,8 @@ def main(xml_filepath: Optional[str], year: Optional[str], volume: Optional[str]
         data_dict["volume"] = "NO_VOL_NUMBER_FOUND"
 
     ### Parse keywords
-    if publication_data.find(".//{http://pkp.sfu.ca}keywords") is not None:
-        keyword_node = publication_data.find(".//{http://pkp.sfu.ca}keywords")
+    keyword_node = fields.node("keywords")
+    if keyword_node is not None:
         data_dict["keywords"] = create_keywords_4yaml(keyword_node)
     else:
         data_dict["keywords"] = ["NO_KEYWORDS_FOUND"]
@@ -161,51 +454,119 @@ def main(xml_filepath: Optional[str], year: Optional[str], volume: Optional[str]
         orcid_dict = parse_orcid(orcid)
 
     ### Parse author data
-    authors_node = publication_data.find(".//{http://pkp.sfu.ca}authors")
-    assert authors_node is not None, "No authors node found"
+    authors_node = fields.node("authors")
+    if authors_node is None:
+        raise InvalidPublicationError("No authors node found")
+    with span("metadata.authors"):
+        add_authors(data_dict, authors_node, orcid_dict, registry)
+
+    ### Parse DOI
+    doi_element = fields.node("doi")
+    if doi_element is not None:
+        doi_xml = doi_element.text if doi_element.text else "NO_DOI_FOUND"
+        data_dict["doi"] = SingleQuotedString(doi_xml)
+    if doi is not None: # Important: DOI from CLI argument overwrites XML DOI!!
+        data_dict["doi"] = SingleQuotedString(doi)
+    elif data_dict["doi"] is None:
+        data_dict["doi"] = "NO_DOI_FOUND"
+
+    ### Add further publication fields (see fields.py)
+    for name, value in fields.items():
+        if name not in DEFAULT_PUBLICATION_FIELDS:
+            data_dict[name] = field_text(value)
+
+    return data_dict
+
+def add_authors(data_dict: Article, authors_node: etree._Element, orcid_dict: Optional[dict], registry: Optional[AuthorRegistry] = None) -> None:
+    '''Function to add the author entries and the short author string of the authors node to data_dict.
+
+        Parameters
+        ----------
+            data_dict: Article
+                The metadata record (see records.py); author and author-short are filled.
+            authors_node: etree._Element
+                The authors node of the publication.
+            orcid_dict: Optional[dict]
+                ORCIDs passed via CLI ({<AUTHOR_LASTNAME>: <ORCID>}, see functions.parse_orcid()).
+            registry: Optional[AuthorRegistry]
+                Author registry: missing ORCIDs and affiliations are filled from it, the authors are added to it
+                (None: no registry, see registry.py).
+    '''
+    from errors import InvalidPublicationError
+    from fields import AUTHOR_FIELDS, DEFAULT_AUTHOR_FIELDS, extract_fields, field_text
+    from functions import parse_given_name
+    from records import Affiliation, Author
+    from registry import Author as RegisteredAuthor
+    from yaml_setup import SingleQuotedString
+    import logging, sqlite3
+    registry_authors: List[RegisteredAuthor] = list()
+    # Parts of the short author string (joined once after the loop)
+    author_short: List[str] = list()
+    # Lowercasing the CLI names once instead of for every author
+    orcid_pairs = [(k.lower(), v) for k, v in orcid_dict.items()] if orcid_dict is not None else list()
     # Counter to find first author
     auth_index: int = 0
     for author in authors_node:
-        # Init author dict
-        author_dict = create_author_dict_4yaml()
+        # Init author record
+        author_dict = Author()
+        author_fields = extract_fields(author, AUTHOR_FIELDS)
         # Create full name
-        given_name_node = author.find(".//{http://pkp.sfu.ca}givenname")
-        family_name_node = author.find(".//{http://pkp.sfu.ca}familyname")
-        assert given_name_node is not None, "Given name node not found"
-        assert family_name_node is not None, "Family name node not found"
+        given_name_node = author_fields.node("givenname")
+        family_name_node = author_fields.node("familyname")
+        if given_name_node is None:
+            raise InvalidPublicationError("Given name node not found")
+        if family_name_node is None:
+            raise InvalidPublicationError("Family name node not found")
         given_name = given_name_node.text
         family_name = family_name_node.text
-        assert given_name is not None, "Given name not found"
-        assert family_name is not None, "Family name not found"
+        if given_name is None:
+            raise InvalidPublicationError("Given name not found")
+        if family_name is None:
+            raise InvalidPublicationError("Family name not found")
         given_name = given_name.strip()
         family_name = family_name.strip()
         full_name = given_name + " " + family_name
         # Add ORCID from CLI arg if present
-        if orcid_dict is not None:
-            for k,v in orcid_dict.items():
-                if k.lower() in family_name.lower():
-                    author_dict["orcid"] = v
+        family_name_lower = family_name.lower()
+        for k, v in orcid_pairs:
+            if k in family_name_lower:
+                author_dict["orcid"] = v
         # Add ORCID from OJS XML (if present) for entries with no explicitly set ORCID via CLI arg
-        orcid_node = author.find(".//{http://pkp.sfu.ca}orcid")
+        orcid_node = author_fields.node("orcid")
         if (orcid_node is not None) and (author_dict["orcid"] is None):
             if orcid_node.text is not None:
                 author_dict["orcid"] = orcid_node.text.split(r"/")[-1]
         # Add name
         author_dict["name"] = full_name
         # Find and add email
-        email_node = author.find(".//{http://pkp.sfu.ca}email")
-        email = email_node.text if email_node.text is not None else "NO_EMAIL_FOUND"
+        email_node = author_fields.node("email")
+        email = email_node.text if email_node is not None and email_node.text is not None else "NO_EMAIL_FOUND"
         author_dict["email"] = email
         # Find affiliations
-        affiliations = author.findall(".//{http://pkp.sfu.ca}affiliation")
-        if affiliations is not None:
-            for aff in author.findall(".//{http://pkp.sfu.ca}affiliation"):
-                # Try to split on ;
-                if aff.text is not None:
-                    aff_list = aff.text.split(";")
-                    aff_list = [aff.strip() for aff in aff_list if aff.strip() != ""]
-                    for aff_ in aff_list:
-                        author_dict["affiliation"].append({"organization": aff_})
+        for aff in author_fields.nodes("affiliation"):
+            # Try to split on ;
+            if aff.text is not None:
+                aff_list = aff.text.split(";")
+                aff_list = [aff.strip() for aff in aff_list if aff.strip() != ""]
+                for aff_ in aff_list:
+                    author_dict["affiliation"].append(Affiliation(aff_))
+        # Back-fill missing ORCID and affiliations from the author registry and register the author
+        if registry is not None:
+            try:
+                registered = registry.lookup(given_name, family_name)
+            except sqlite3.Error as e:
+                logging.warning(f"The author registry could not be read: {e}")
+                registered = None
+            if registered is not None:
+                if author_dict["orcid"] is None and registered.orcid is not None:
+                    author_dict["orcid"] = registered.orcid
+                if len(author_dict["affiliation"]) == 0:
+                    author_dict["affiliation"] = [Affiliation(aff_) for aff_ in registered.affiliations]
+            registry_authors.append(RegisteredAuthor(given_name, family_name, author_dict["orcid"], [aff_.organization for aff_ in author_dict["affiliation"]], email_node.text if email_node is not None else None))
+        # Add further author fields (see fields.py)
+        for name, value in author_fields.items():
+            if name not in DEFAULT_AUTHOR_FIELDS:
+                author_dict[name] = field_text(value)
         
         ### Create author short name
         #### First we need to create two abbreviated versions of name (part. if given name has multiple parts)
@@ -213,16 +574,16 @@ def main(xml_filepath: Optional[str], year: Optional[str], volume: Optional[str]
 
         #### Layout for "middle" author (in case authors > 2)
         if auth_index > 0 and auth_index < len(authors_node)-1:
-            data_dict["author-short"] += ", " + SingleQuotedString(family_name + ", " + given_name_parsed_full)
+            author_short.append(", " + family_name + ", " + given_name_parsed_full)
         #### Layout for "last" author (in case authors > 2)
         elif auth_index > 0 and auth_index == len(authors_node)-1 and auth_index != 1:
-            data_dict["author-short"] += ", & " + SingleQuotedString(family_name + ", " + given_name_parsed_full)
+            author_short.append(", & " + family_name + ", " + given_name_parsed_full)
         #### Layout second author of exactly two authors
         elif auth_index == 1 and auth_index == len(authors_node)-1:
-            data_dict["author-short"] += ", & " + SingleQuotedString(family_name + ", " + given_name_parsed_full)
+            author_short.append(", & " + family_name + ", " + given_name_parsed_full)
         #### Layout for first or only one author
         else:
-            data_dict["author-short"] = SingleQuotedString(family_name + ", " + given_name_parsed_full)
+            author_short = [family_name + ", " + given_name_parsed_full]
 
         ### Add author information to data_dict
         data_dict["author"].append(author_dict)
@@ -230,22 +591,80 @@ def main(xml_filepath: Optional[str], year: Optional[str], volume: Optional[str]
         # Increment auth idx
         auth_index += 1
 
-    ### Parse DOI
-    if publication_data.find(".//{http://pkp.sfu.ca}id[@type='doi']") is not None:
-        doi_element = publication_data.find(".//{http://pkp.sfu.ca}id[@type='doi']")
-        doi_xml = doi_element.text if doi_element.text else "NO_DOI_FOUND"
-        data_dict["doi"] = SingleQuotedString(doi_xml)
-    if doi is not None: # Important: DOI from CLI argument overwrites XML DOI!!
-        data_dict["doi"] = SingleQuotedString(doi)
-    elif data_dict["doi"] is None:
-        data_dict["doi"] = "NO_DOI_FOUND"
+    # A single author stays single-quoted; several authors give a plain string
+    if len(author_short) == 1:
+        data_dict["author-short"] = SingleQuotedString(author_short[0])
+    elif len(author_short) > 1:
+        data_dict["author-short"] = "".join(author_short)
+
+    if registry is not None and len(registry_authors) > 0:
+        try:
+            registry.add_authors(registry_authors)
+        except sqlite3.Error as e:
+            # The registry is an aid; the conversion does not depend on it
+            logging.warning(f"The authors could not be added to the author registry: {e}")
+
+def dump_json(data_dict: Article, compact: bool = False) -> str:
+    '''Function to serialise the metadata as JSON (same values as the YAML, e.g. for pandoc's --metadata-file).
+
+        Parameters
+        ----------
+            data_dict: Article
+                The metadata record of create_metadata(). The strings keep the markdown of escape_html() and the *volume*
+                formatting; the quoting classes of yaml_setup only matter for YAML (PlainInt is written as number).
+            compact: bool (default: False)
+                A single line without indentation (for NDJSON streams) instead of an indented document.
+
+        Returns
+        -------
+            str
+                The JSON document (terminated by a newline).
+    '''
+    import json
+    if compact:
+        return json.dumps(_json_value(data_dict), ensure_ascii=False, separators=(",", ":")) + "\n"
+    return json.dumps(_json_value(data_dict), ensure_ascii=False, indent=2) + "\n"
+
+def _json_value(value):
+    '''Returns value with records as dicts and PlainInt strings converted to numbers (as the YAML int tag does).'''
+    from records import Record
+    from yaml_setup import PlainInt
+    if isinstance(value, PlainInt):
+        try:
+            return int(value)
+        except ValueError:
+            return str(value)
+    if isinstance(value, (dict, Record)):
+        return {key: _json_value(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_json_value(item) for item in value]
+    return value
+
+def dump_document(data_dict: Article, output_format: str = "yaml") -> str:
+    '''Function to serialise the metadata in one of the OUTPUT_FORMATS.'''
+    if output_format == "yaml":
+        return dump_yaml(data_dict)
+    return dump_json(data_dict, compact=output_format == "ndjson")
+
+def dump_yaml(data_dict: Article) -> str:
+    '''Function to serialise the YAML metadata.'''
+    # Importing yaml_setup registers the custom representers (on libyaml's CDumper if available)
+    from yaml_setup import select_dumper, yaml
+    return yaml.dump(data_dict, Dumper=select_dumper(data_dict), allow_unicode=True, default_flow_style=False, explicit_start=True, explicit_end=True, default_style="")
 
-    ### Save YAML metadata
-    with open("yaml_output/metadata.yaml", "w", encoding="utf-8") as f:
-        yaml.dump(data_dict, f, allow_unicode=True, default_flow_style=False, explicit_start=True, explicit_end=True, default_style="")
+def save_yaml(document: str, output_path: str, lock: bool = False) -> None:
+    '''Function to save a YAML (or JSON) document to output_path (- for stdout), replacing the file atomically (see output.py; lock: hold <output_path>.lock while writing).'''
+    if output_path == "-":
+        import sys
+        # Writing bytes: the YAML is UTF-8 regardless of the locale of the container
+        sys.stdout.buffer.write(document.encode("utf-8"))
+        sys.stdout.buffer.flush()
+        return
+    from output import write_atomic
+    write_atomic(output_path, document, lock)
 
 if __name__ == "__main__":
     # Parse arguments
-    xml_file_path, year, volume, orcid, doi = parse_arguments()
+    args = parse_arguments()
     # Run main program
-    main(xml_file_path, year, volume, orcid, doi)
+    main(args)
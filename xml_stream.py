@@ -0,0 +1,266 @@
+'''
+Streaming ingestion of OJS XML exports.
+
+OJS embeds the submission files (PDF, DOCX, ...) as base64 text in the native XML export. Building a full
+DOM of such a file costs several times the size of the embedded payloads although XML2YAML only needs the
+publication metadata. The parser target in this module builds a tree for everything except the
+submission_file subtrees and embedded payloads (their text chunks are dropped as soon as the parser hands
+them over).
+
+Exports can contain a single article (root element article), several articles (root element articles) or
+whole issues (articles nested in issue elements). The first publication of every article is handed out as
+soon as the article is complete; the article is then detached from the tree so that memory only grows with
+the largest single article. For single-article exports reading stops once the publication is complete.
+
+If a SubmissionFileExtractor (see submission_files.py) is passed, the events of the submission_file subtrees are
+handed to it instead of being dropped, so the embedded files are decoded to disk in the same pass (reading then
+continues to the end of the export).
+'''
+
+from collections import deque
+from lxml import etree
+from typing import TYPE_CHECKING, BinaryIO, Deque, Generator, Iterator, List, Optional, Union
+
+from errors import InvalidXMLError
+from output import safe_file_name
+
+if TYPE_CHECKING:
+    from submission_files import SubmissionFileExtractor
+
+PKP_NS: str = "{http://pkp.sfu.ca}"
+SUBMISSION_FILE_TAG: str = PKP_NS + "submission_file"
+EMBED_TAG: str = PKP_NS + "embed"
+ARTICLE_TAG: str = PKP_NS + "article"
+PUBLICATION_TAG: str = PKP_NS + "publication"
+ID_TAG: str = PKP_NS + "id"
+
+# Subtrees that are never built (base64 payloads of submission files, issue galleys, covers)
+SKIPPED_TAGS = frozenset((SUBMISSION_FILE_TAG, EMBED_TAG))
+
+# Size of the chunks read from the input and fed into the parser
+CHUNK_SIZE: int = 64 * 1024
+
+
+class PublicationTarget:
+    '''lxml parser target that builds the article trees without submission_file subtrees and embedded payloads.
+
+        Completed publications (the first publication of every article) are collected in the attribute
+        publications. If the root element itself is an article, the target ignores all events after its
+        publication and sets the attribute done to True so that the caller can stop reading (not if files is set).
+
+        Parameters
+        ----------
+        files: Optional[SubmissionFileExtractor]
+            Extractor receiving the events of the submission_file subtrees (None: they are dropped).
+    '''
+
+    def __init__(self, files: Optional["SubmissionFileExtractor"] = None) -> None:
+        self.builder = etree.TreeBuilder()
+        self.depth: int = 0
+        # Depth and tag of the subtree we are currently skipping (None if not skipping)
+        self.skip_depth: Optional[int] = None
+        self.skip_tag: Optional[str] = None
+        # Depths of the currently open article elements and whether their publication has been found
+        self.article_depths: List[int] = list()
+        self.article_has_publication: List[bool] = list()
+        self.publications: Deque[etree._Element] = deque()
+        self.done: bool = False
+        self.files = files
+        # Submission ids (or positions) of the open article elements, naming the folders of the extracted files
+        self.article_keys: List[str] = list()
+        self.article_count: int = 0
+
+    def start(self, tag: str, attrib: dict, nsmap: Optional[dict] = None) -> None:
+        self.depth += 1
+        if self.done:
+            return
+        if self.skip_depth is not None:
+            if self.files is not None and self.skip_tag == SUBMISSION_FILE_TAG:
+                self.files.start(tag, attrib)
+            return
+        if tag in SKIPPED_TAGS:
+            self.skip_depth = self.depth
+            self.skip_tag = tag
+            if self.files is not None and tag == SUBMISSION_FILE_TAG:
+                self.files.start_submission_file(attrib, self.article_keys[-1] if self.article_keys else str(self.article_count))
+            return
+        # The parser reports the default namespace with the prefix '', TreeBuilder expects None
+        if nsmap:
+            nsmap = {(prefix or None): uri for prefix, uri in nsmap.items()}
+        # (lxml-stubs 0.4 lacks the nsmap argument of TreeBuilder.start() and the element returned by TreeBuilder.end())
+        self.builder.start(tag, attrib, nsmap)  # type: ignore[call-arg]
+        if tag == ARTICLE_TAG:
+            self.article_depths.append(self.depth)
+            self.article_has_publication.append(False)
+            self.article_count += 1
+            self.article_keys.append(str(self.article_count))
+
+    def end(self, tag: str) -> None:
+        depth = self.depth
+        self.depth -= 1
+        if self.done:
+            return
+        if self.skip_depth is not None:
+            if self.files is not None and self.skip_tag == SUBMISSION_FILE_TAG:
+                if depth == self.skip_depth:
+                    self.files.end_submission_file()
+                else:
+                    self.files.end(tag)
+            if depth == self.skip_depth:
+                self.skip_depth = None
+            return
+        element: etree._Element = self.builder.end(tag)  # type: ignore[func-returns-value]
+        if tag == ID_TAG and self.article_depths and depth == self.article_depths[-1] + 1 and element.get("type") == "internal" and element.text:
+            # The key names the folder of the extracted files: an id like ../../x must not leave the output folder
+            self.article_keys[-1] = safe_file_name(element.text.strip()) or self.article_keys[-1]
+        if tag == PUBLICATION_TAG:
+            # Only the first publication directly below an article is used (same as article.find("publication"))
+            if self.article_depths and depth == self.article_depths[-1] + 1 and not self.article_has_publication[-1]:
+                self.article_has_publication[-1] = True
+                self.publications.append(element)
+                # Single-article export: nothing else to read (unless submission files are extracted)
+                if self.article_depths[-1] == 1 and self.files is None:
+                    self.done = True
+        elif tag == ARTICLE_TAG and self.article_depths and depth == self.article_depths[-1]:
+            self.article_depths.pop()
+            self.article_has_publication.pop()
+            article_key = self.article_keys.pop()
+            if self.files is not None:
+                self.files.end_article(article_key)
+            # Detaching the finished article; its publication (if any) stays alive until it has been consumed
+            parent = element.getparent()
+            if parent is not None:
+                parent.remove(element)
+
+    def data(self, data: str) -> None:
+        # Dropping text chunks of skipped subtrees (base64 payloads) right away, or decoding them to disk
+        if self.done:
+            return
+        if self.skip_depth is not None:
+            if self.files is not None and self.skip_tag == SUBMISSION_FILE_TAG:
+                self.files.data(data)
+            return
+        self.builder.data(data)
+
+    def comment(self, text: str) -> None:
+        if self.done or self.skip_depth is not None:
+            return
+        self.builder.comment(text)
+
+    def pi(self, target: str, data: Optional[str] = None) -> None:
+        if self.done or self.skip_depth is not None:
+            return
+        self.builder.pi(target, data)
+
+    def doctype(self, name: str, pubid: Optional[str], system: Optional[str]) -> None:
+        # OJS exports have no document type declaration: rejecting it rules out entity expansion (billion laughs) and
+        # external entities (XXE) before the internal subset is read
+        raise InvalidXMLError(f"Document type declarations are not allowed (<!DOCTYPE {name}>)")
+
+    def close(self) -> None:
+        return None
+
+
+def iter_publications(source: Union[str, BinaryIO], files: Optional["SubmissionFileExtractor"] = None) -> Generator[etree._Element, None, None]:
+    '''Function to stream-parse an OJS XML export and yield the publication node of every article.
+
+        Parameters
+        ----------
+        source: Union[str, BinaryIO]
+            Path to the OJS XML file or a binary file object.
+        files: Optional[SubmissionFileExtractor]
+            If given, the embedded submission files are decoded to disk while parsing (see submission_files.py).
+
+        Returns
+        -------
+        Generator[etree._Element, None, None]
+            The first publication element of every article in document order (one at a time; close() stops the
+            parse and closes the file).
+    '''
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            yield from _iter_feed(f, files)
+    else:
+        yield from _iter_feed(source, files)
+
+def parse_publication(source: Union[str, BinaryIO]) -> Optional[etree._Element]:
+    '''Function to stream-parse an OJS XML export and return the publication node of its first article.
+
+        Parameters
+        ----------
+        source: Union[str, BinaryIO]
+            Path to the OJS XML file or a binary file object.
+
+        Returns
+        -------
+        Optional[etree._Element]
+            The first publication element or None if there is no such element.
+    '''
+    publications = iter_publications(source)
+    try:
+        return next(publications, None)
+    finally:
+        publications.close()
+
+def iter_element_publications(element: Union[etree._Element, etree._ElementTree]) -> Iterator[etree._Element]:
+    '''Function to yield the publication node of every article of an already parsed OJS XML tree (left unchanged).
+
+        Parameters
+        ----------
+        element: Union[etree._Element, etree._ElementTree]
+            The parsed export (root element articles/article/issue/issues) or a single publication element.
+
+        Returns
+        -------
+        Iterator[etree._Element]
+            The first publication element of every article in document order.
+    '''
+    if isinstance(element, etree._ElementTree):
+        element = element.getroot()
+    if element.tag == PUBLICATION_TAG:
+        yield element
+        return
+    for article in element.iter(ARTICLE_TAG):
+        publication = article.find(PUBLICATION_TAG)
+        if publication is not None:
+            yield publication
+
+def submission_id(publication: etree._Element) -> Optional[str]:
+    '''Returns the internal OJS id of the article (submission) of a publication (None if it is not available).'''
+    article = publication.getparent()
+    if article is None or article.tag != ARTICLE_TAG:
+        return None
+    for element in article.iterchildren(ID_TAG):
+        if element.get("type") == "internal" and element.text:
+            return element.text.strip()
+    return None
+
+def _iter_feed(f: BinaryIO, files: Optional["SubmissionFileExtractor"] = None) -> Iterator[etree._Element]:
+    '''Feeds chunks from f into the parser and yields every completed publication right away.'''
+    target = PublicationTarget(files)
+    # huge_tree: base64 payloads can exceed libxml2's default text size limit; they never end up in memory here.
+    # huge_tree also lifts libxml2's limits on entity expansion, and in server mode the input is an untrusted upload:
+    # entities are not substituted, nothing is loaded from the network and DTDs are rejected (see PublicationTarget.doctype())
+    # (lxml-stubs 0.4 types the callbacks of parser targets for str and bytes; lxml passes str)
+    parser = etree.XMLParser(target=target, huge_tree=True, resolve_entities=False, no_network=True, load_dtd=False)  # type: ignore[arg-type]
+    # read1() returns what is available (e.g. from a pipe) instead of waiting for a full chunk
+    read = getattr(f, "read1", f.read)
+    try:
+        while not target.done:
+            chunk = read(CHUNK_SIZE)
+            if not chunk:
+                # close() raises on malformed XML
+                parser.close()
+                break
+            parser.feed(chunk)
+            while target.publications:
+                yield target.publications.popleft()
+    except BaseException:
+        # Malformed XML or the caller stopped early: no partial submission files are left behind
+        if files is not None:
+            files.abort()
+        raise
+    if files is not None:
+        files.close()
+    while target.publications:
+        yield target.publications.popleft()
@@ -3,13 +3,49 @@
 import yaml
 from collections import OrderedDict
 
+####### DUMPER
+
+# libyaml's C emitter if PyYAML has been built with it, the pure-Python emitter otherwise (same output, see
+# benchmarks/bench_yaml_dump.py for the parity check)
+import re
+from records import Affiliation, Article, Author, Record
+try:
+    from yaml import CDumper as Dumper
+except ImportError:
+    from yaml import Dumper  # type: ignore[assignment]
+
+# Strings both emitters write alike: printable BMP characters without line breaks and without leading/trailing
+# space. Other strings can end up double-quoted (which libyaml folds differently) or escaped differently
+# (characters outside the BMP, NEL, line/paragraph separators, tabs), so their documents use the Python emitter.
+_NOT_C_SAFE = re.compile("[^\x20-\x7e\xa0-\u2027\u202a-\ud7ff\ue000-\ufefe\uff00-\ufffd]|^ | $")
+
+def select_dumper(data) -> type:
+    '''Returns Dumper (libyaml if available) or yaml.Dumper for strings libyaml would emit differently.'''
+    if Dumper is yaml.Dumper:
+        return Dumper
+    stack = [data]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            if _NOT_C_SAFE.search(item):
+                return yaml.Dumper
+        elif isinstance(item, (dict, Record)):
+            for key, value in item.items():
+                stack.append(key)
+                stack.append(value)
+        elif isinstance(item, (list, tuple)):
+            stack.extend(item)
+    return Dumper
+
+# Note: the representers pass plain str values because the libyaml emitter does not accept str subclasses
+
 ####### LITERAL BLOCKS
 
 class LiteralString(str):
     pass
 
 def literal_block_style(dumper, data):
-    return dumper.represent_scalar("tag:yaml.org,2002:str", data, style="|")
+    return dumper.represent_scalar("tag:yaml.org,2002:str", str(data), style="|")
 
 ####### PLAIN INT
 
@@ -17,7 +53,7 @@ class PlainInt(str):
     pass
 
 def plain_int_style(dumper, data):
-    return dumper.represent_scalar("tag:yaml.org,2002:int", data, style=None)
+    return dumper.represent_scalar("tag:yaml.org,2002:int", str(data), style=None)
 
 ####### PLAIN STRING
 
@@ -26,7 +62,7 @@ class PlainString(str):
     pass
 
 def plain_string_style(dumper, data):
-    return dumper.represent_scalar("tag:yaml.org,2002:str", data, style=None)
+    return dumper.represent_scalar("tag:yaml.org,2002:str", str(data), style=None)
 
 ####### SINGLE QUOTED STRING
 
@@ -34,7 +70,7 @@ class SingleQuotedString(str):
     pass
 
 def single_quoted_style(dumper, data):
-    return dumper.represent_scalar("tag:yaml.org,2002:str", data, style="'")
+    return dumper.represent_scalar("tag:yaml.org,2002:str", str(data), style="'")
 
 ####### LIST
 
@@ -53,12 +89,25 @@ def represent_ordereddict(dumper, data):
     return dumper.represent_mapping("tag:yaml.org,2002:map", data.items())
 
 
+####### RECORDS
+
+def represent_record(dumper, data):
+    """
+    Representer for the metadata records (records.py): a mapping with the keys in the order of the former OrderedDicts
+    """
+    return dumper.represent_mapping("tag:yaml.org,2002:map", data.items())
+
+
 ####### REGISTRATION
 
-# Register the custom representer for OrderedDict
-yaml.add_representer(OrderedDict, represent_ordereddict)
-yaml.add_representer(LiteralString, literal_block_style)
-yaml.add_representer(SingleQuotedString, single_quoted_style)
-yaml.add_representer(PlainInt, plain_int_style)
-yaml.add_representer(PlainString, plain_string_style)
-yaml.add_representer(PlainList, represent_list)
\ No newline at end of file
+# Register the custom representers on the default dumper and (if available) on the libyaml dumper
+for dumper in dict.fromkeys((yaml.Dumper, Dumper)):
+    # Register the custom representer for OrderedDict
+    yaml.add_representer(OrderedDict, represent_ordereddict, Dumper=dumper)
+    yaml.add_representer(LiteralString, literal_block_style, Dumper=dumper)
+    yaml.add_representer(SingleQuotedString, single_quoted_style, Dumper=dumper)
+    yaml.add_representer(PlainInt, plain_int_style, Dumper=dumper)
+    yaml.add_representer(PlainString, plain_string_style, Dumper=dumper)
+    yaml.add_representer(PlainList, represent_list, Dumper=dumper)
+    for record_class in (Article, Author, Affiliation):
+        yaml.add_representer(record_class, represent_record, Dumper=dumper)